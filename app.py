@@ -1,181 +1,3405 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-import pandas as pd
-import numpy as np
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, abort, g, has_request_context
+import importlib
 import json
+import pickle
+import uuid
+import secrets
 import io
-import base64
+import itertools
+import hashlib
 from datetime import timedelta
 import os
+import time
+import threading
+import multiprocessing
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from collections import deque, OrderedDict
+from contextlib import closing, contextmanager
+from xml.etree import ElementTree
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import CallbackDict
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
 from dotenv import load_dotenv
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler, MinMaxScaler
-from sklearn.linear_model import LinearRegression, Ridge, Lasso, LogisticRegression
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, accuracy_score
 import warnings
 warnings.filterwarnings('ignore')
 
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# Heavy dependencies load per subsystem, so a worker serving static pages never imports them:
+# pandas/NumPy on first data access, matplotlib when a plot is drawn, scikit-learn, joblib
+# and the preprocessing/scoring modules inside the training and prediction code.
+# preload_dependencies() imports everything up front (gunicorn preload_app, see gunicorn.conf.py)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+plt = LazyModule('matplotlib.pyplot')
+
+def preload_dependencies():
+    """Import every lazily loaded dependency now (run in the gunicorn master before forking)"""
+    for name in ('pandas', 'numpy', 'matplotlib.pyplot', 'sklearn.linear_model', 'sklearn.model_selection',
+                 'sklearn.pipeline', 'sklearn.preprocessing', 'sklearn.metrics', 'joblib',
+                 'preprocessors', 'linear_scorer'):
+        importlib.import_module(name)
+
 # Load environment variables
 load_dotenv()
 
-# Detect database type and import appropriate library
-DATABASE_URL = os.getenv('DATABASE_URL', '')  # Render PostgreSQL uses this
-USE_POSTGRESQL = bool(DATABASE_URL)
+# Detect database type and import appropriate library
+DATABASE_URL = os.getenv('DATABASE_URL', '')  # Render PostgreSQL uses this
+USE_SQLITE = os.getenv('DB_TYPE', '').lower() == 'sqlite'  # Single node: embedded, no server
+USE_POSTGRESQL = bool(DATABASE_URL) and not USE_SQLITE
+
+if USE_SQLITE:
+    # Embedded: SQLite (sqlite3 is imported above)
+    from sqlite3 import Error
+    print("🪶 Using SQLite (Embedded)")
+elif USE_POSTGRESQL:
+    # Production: PostgreSQL (Render)
+    import psycopg2
+    from psycopg2 import Error
+    print("🐘 Using PostgreSQL (Render)")
+else:
+    # Local: MySQL
+    import mysql.connector
+    from mysql.connector import Error
+    print("🐬 Using MySQL (Local)")
+
+app = Flask(__name__)
+
+# Production-ready configuration using environment variables
+app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=int(os.getenv('SESSION_LIFETIME_HOURS', 2)))
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+
+# Database Configuration
+# Automatically detects if running on Render (PostgreSQL) or Local (MySQL); DB_TYPE=sqlite
+# selects an embedded database file instead
+if USE_SQLITE:
+    # SQLite - one database file, shared by every worker on the host through WAL mode
+    DB_CONFIG = {
+        'database': os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_webapp.sqlite3')),
+        # Seconds a writer waits for another process's write lock before failing
+        'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 30)),
+    }
+    DB_TYPE = 'sqlite'
+elif USE_POSTGRESQL:
+    # Render PostgreSQL - uses DATABASE_URL
+    DB_CONFIG = DATABASE_URL
+    DB_TYPE = 'postgresql'
+else:
+    # Local MySQL - uses individual parameters from .env
+    DB_CONFIG = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', 'password'),
+        'database': os.getenv('DB_NAME', 'ml_webapp_db')
+    }
+    DB_TYPE = 'mysql'
+
+# Dataset storage: 'sql' keeps uploaded datasets in database tables; 'arrow' (uncompressed
+# Arrow IPC) or 'parquet' keeps them as versioned files under DATASET_DIR that are memory-mapped
+# on load, reading only the columns a route needs. Models and jobs stay where they are
+DATASET_STORAGE = os.getenv('DATASET_STORAGE', 'sql').lower()
+DATASET_DIR = os.getenv('DATASET_DIR', os.path.join(tempfile.gettempdir(), 'ml_webapp_datasets'))
+
+# Bulk loading: rows per COPY / executemany batch, and optional MySQL LOAD DATA LOCAL INFILE
+DB_INSERT_BATCH_SIZE = int(os.getenv('DB_INSERT_BATCH_SIZE', 10000))
+MYSQL_LOAD_DATA_LOCAL = os.getenv('MYSQL_LOAD_DATA_LOCAL', 'False').lower() == 'true'
+COPY_NULL_MARKER = '\\N'
+if DB_TYPE == 'mysql' and MYSQL_LOAD_DATA_LOCAL:
+    DB_CONFIG['allow_local_infile'] = True
+
+# Connection pool (per worker process): size bounds, checkout timeout and the idle
+# time after which a connection is pinged before being handed out
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 30))
+
+# In-process DataFrame cache in front of load_dataframe_from_db (0 disables it)
+DATAFRAME_CACHE_BYTES = int(os.getenv('DATAFRAME_CACHE_BYTES', 256 * 1024 * 1024))
+
+# Bookkeeping table: one row per dataset table, version bumped on every save
+DATASET_VERSIONS_TABLE = 'dataset_versions'
+
+# Per-table logical column kinds recorded at save time and used to restore compact dtypes
+DATASET_SCHEMAS_TABLE = 'dataset_schemas'
+
+# Every save loads a new physical table and then repoints the dataset at it in one short
+# transaction, so readers never see a missing or half-loaded table. Replaced tables stay
+# readable for DATASET_VERSION_RETENTION seconds (for in-flight readers), then are dropped
+DATASET_TABLES_TABLE = 'dataset_tables'
+DATASET_VERSION_RETENTION = float(os.getenv('DATASET_VERSION_RETENTION', 300))
+
+# Owner session, size and last access of every dataset. A dataset its session has not
+# touched for longer than a session can live is unreachable, and the sweeper drops it
+DATASET_REGISTRY_TABLE = 'dataset_registry'
+# Uploaded datasets are named DATASET_PREFIX + a random id; unregistered tables with the
+# prefix (older uploads, crashed saves) are adopted into the registry by the sweeper
+DATASET_PREFIX = 'user_data_'
+# Seconds between sweeps in each worker (0 disables the background sweeper)
+DATASET_SWEEP_INTERVAL = float(os.getenv('DATASET_SWEEP_INTERVAL', 600))
+# A dataset's last access is written at most this often per worker
+DATASET_TOUCH_INTERVAL = float(os.getenv('DATASET_TOUCH_INTERVAL', 60))
+
+# Content-addressed index of uploads: an upload whose bytes (and type) hash to an indexed
+# dataset reuses that dataset instead of being parsed and inserted again. Datasets are
+# never modified in place (preprocessing is replayed per session), so sharing one is safe
+DATASET_CONTENTS_TABLE = 'dataset_contents'
+UPLOAD_DEDUP = os.getenv('UPLOAD_DEDUP', 'True').lower() == 'true'
+
+# Text columns with at most this share of distinct values are loaded as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = float(os.getenv('CATEGORY_MAX_UNIQUE_RATIO', 0.5))
+
+# Aggregate pushdown: compute value counts, summaries and previews in the database
+# instead of loading whole tables (falls back to pandas when unavailable)
+AGGREGATE_PUSHDOWN = os.getenv('AGGREGATE_PUSHDOWN', 'True').lower() == 'true'
+VALUE_COUNTS_LIMIT = int(os.getenv('VALUE_COUNTS_LIMIT', 1000))
+PREVIEW_ROWS = 10
+
+# Model registry: fitted estimators persisted by /training, cached per worker for /predict
+MODELS_TABLE = 'trained_models'
+MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', 32))
+# Linear models are compiled into a NumPy scorer when loaded, bypassing pandas/sklearn per request
+FAST_LINEAR_SCORER = os.getenv('FAST_LINEAR_SCORER', 'True').lower() == 'true'
+
+# Model comparison: k-fold cross-validation of every algorithm over a small hyperparameter grid,
+# fitted in parallel; feature matrices larger than CV_MEMMAP_BYTES are shared with the
+# workers as one read-only memmap instead of being pickled to each of them
+CV_FOLDS = int(os.getenv('CV_FOLDS', 5))
+CV_JOBS = int(os.getenv('CV_JOBS', -1))
+CV_MEMMAP_BYTES = os.getenv('CV_MEMMAP_BYTES', '1M')
+MODEL_GRIDS = {
+    'linear': [{}],
+    'ridge': [{'alpha': alpha} for alpha in (0.1, 1.0, 10.0)],
+    'lasso': [{'alpha': alpha} for alpha in (0.01, 0.1, 1.0)],
+    'logistic': [{'C': c} for c in (0.1, 1.0, 10.0)],
+}
+# Integer targets with at most this many distinct values are treated as class labels
+CLASSIFICATION_MAX_CLASSES = 20
+
+# Incremental training: the table is streamed through a server-side cursor and SGD models are
+# fit with partial_fit, so memory is bounded by the chunk size rather than the table
+INCREMENTAL_CHUNK_ROWS = int(os.getenv('INCREMENTAL_CHUNK_ROWS', 50000))
+INCREMENTAL_EPOCHS = int(os.getenv('INCREMENTAL_EPOCHS', 5))
+# Steps without an exact streaming fit (median/mode fills, outlier fences) are fit on a random sample
+INCREMENTAL_SAMPLE_ROWS = int(os.getenv('INCREMENTAL_SAMPLE_ROWS', 100000))
+
+# Batch scoring: rows read, predicted and streamed back per chunk by /predict_batch
+PREDICT_CHUNK_ROWS = int(os.getenv('PREDICT_CHUNK_ROWS', 10000))
+BATCH_INPUT_EXTENSIONS = {'csv', 'jsonl', 'ndjson'}
+
+# Uploads are parsed and written to the database this many rows at a time
+UPLOAD_CHUNK_ROWS = int(os.getenv('UPLOAD_CHUNK_ROWS', 50000))
+
+# Background jobs: state lives in a local SQLite file shared by every worker on the host,
+# work runs in a per-worker process pool (JOB_EXECUTOR=thread uses threads instead)
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_webapp_jobs.sqlite3'))
+JOB_EXECUTOR = os.getenv('JOB_EXECUTOR', 'process')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_UPLOAD_DIR = os.getenv('JOB_UPLOAD_DIR', tempfile.gettempdir())
+
+# Sessions: 'sqlite' keeps session data server-side (cookie carries only an id),
+# 'cookie' falls back to Flask's signed-cookie sessions
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_webapp_sessions.sqlite3'))
+SESSION_CLEANUP_INTERVAL = int(os.getenv('SESSION_CLEANUP_INTERVAL', 300))
+
+# Rendered plots: cached in a local SQLite file keyed by (table version, columns, plot type),
+# bounded by total image bytes, and served from /plots/<plot_id> with an ETag
+PLOTS_DB_PATH = os.getenv('PLOTS_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_webapp_plots.sqlite3'))
+PLOT_CACHE_BYTES = int(os.getenv('PLOT_CACHE_BYTES', 64 * 1024 * 1024))
+PLOT_MAX_AGE = int(os.getenv('PLOT_MAX_AGE', 3600))
+PLOT_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+# Boxplots are drawn from precomputed statistics; at most this many outliers are drawn per column
+BOXPLOT_MAX_FLIERS = int(os.getenv('BOXPLOT_MAX_FLIERS', 1000))
+
+# Instrumentation: per-route latency histograms and per-phase spans (DB load/save, transform,
+# fit, plot render, ...) with row and byte counts, exported in Prometheus text format at
+# /metrics and per request as a Server-Timing header. Each process writes its metrics to a
+# host-local SQLite file at most every METRICS_FLUSH_INTERVAL seconds (and when it serves a
+# scrape), so /metrics on any worker reports the totals of all of them
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', os.path.join(tempfile.gettempdir(), 'ml_webapp_metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Allowed file extensions
+ALLOWED_EXTENSIONS = {'csv', 'json', 'xml'}
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and label values"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        """Start empty with a fresh lock (a forked child must not count its parent's values twice)"""
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Counters and histograms as JSON-serializable [name, labels, value] lists"""
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, dict(value, buckets=list(value['buckets']))]
+                               for (name, labels), value in self._histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        """Add another process's snapshot() to this registry"""
+        with self._lock:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, value in snapshot['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    self._histograms[key] = dict(value, buckets=list(value['buckets']))
+                    continue
+                histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], value['buckets'])]
+                histogram['sum'] += value['sum']
+                histogram['count'] += value['count']
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self, help_texts, gauges=()):
+        """Prometheus text exposition of every metric, plus (name, labels, value) gauges"""
+        def series(name, labels, value, extra=()):
+            pairs = ','.join(f'{k}="{escape_label(v)}"' for k, v in tuple(labels) + tuple(extra))
+            return f"{name}{{{pairs}}} {value}" if pairs else f"{name} {value}"
+        
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._histograms.items()}
+        lines, described = [], set()
+        
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+        
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, 'counter')
+            lines.append(series(name, labels, value))
+        for (name, labels), histogram in sorted(histograms.items()):
+            describe(name, 'histogram')
+            for bound, count in zip(self.buckets, histogram['buckets']):
+                lines.append(series(f"{name}_bucket", labels, count, [('le', bound)]))
+            lines.append(series(f"{name}_bucket", labels, histogram['count'], [('le', '+Inf')]))
+            lines.append(series(f"{name}_sum", labels, histogram['sum']))
+            lines.append(series(f"{name}_count", labels, histogram['count']))
+        for name, labels, value in gauges:
+            describe(name, 'gauge')
+            lines.append(series(name, sorted(labels.items()), value))
+        return '\n'.join(lines) + '\n'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = MetricsRegistry(LATENCY_BUCKETS)
+
+# Row in the metrics store holding the values of processes that have exited
+RETIRED_METRICS = 'retired'
+
+_metrics_instance = None
+_metrics_flushed_at = 0.0
+
+def _reset_metrics_after_fork():
+    global _metrics_instance, _metrics_flushed_at
+    metrics.reset()
+    _metrics_instance = None
+    _metrics_flushed_at = 0.0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_metrics_after_fork)
+
+def metrics_instance():
+    """Id of this process in the metrics store (a pid alone may be reused after a restart)"""
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    return _metrics_instance
+
+def metrics_db():
+    """Open a connection to the local metrics store (autocommit; writers take BEGIN IMMEDIATE)"""
+    connection = open_local_db(
+        METRICS_DB_PATH,
+        "CREATE TABLE IF NOT EXISTS metrics ("
+        "instance TEXT PRIMARY KEY, pid INTEGER NOT NULL, data TEXT NOT NULL, "
+        "gauges TEXT NOT NULL, updated_at REAL NOT NULL)"
+    )
+    connection.isolation_level = None
+    return connection
+
+def flush_metrics(force=False):
+    """Write this process's metrics to the store, at most every METRICS_FLUSH_INTERVAL seconds unless forced"""
+    global _metrics_flushed_at
+    now = time.time()
+    if not METRICS_ENABLED or (not force and now - _metrics_flushed_at < METRICS_FLUSH_INTERVAL):
+        return
+    _metrics_flushed_at = now
+    with closing(metrics_db()) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO metrics (instance, pid, data, gauges, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (metrics_instance(), os.getpid(), json.dumps(metrics.snapshot()), json.dumps(metric_gauges()), now)
+        )
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def render_all_metrics():
+    """Prometheus text for every process on this host.
+
+    Counters and histograms are summed over all processes, including exited ones, so
+    totals never go backwards; gauges are reported per live process with a pid label.
+    Rows of exited processes are folded into one retired row.
+    """
+    flush_metrics(force=True)
+    combined = MetricsRegistry(LATENCY_BUCKETS)
+    retired = MetricsRegistry(LATENCY_BUCKETS)
+    gauges, exited, seen_pids = [], [], set()
+    with closing(metrics_db()) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT instance, pid, data, gauges FROM metrics ORDER BY updated_at DESC"
+            ).fetchall()
+            for row in rows:
+                snapshot = json.loads(row['data'])
+                combined.merge(snapshot)
+                if row['instance'] == RETIRED_METRICS:
+                    retired.merge(snapshot)
+                # An older row with a pid seen already belongs to a process that exited
+                elif row['pid'] in seen_pids or not process_alive(row['pid']):
+                    retired.merge(snapshot)
+                    exited.append(row['instance'])
+                else:
+                    seen_pids.add(row['pid'])
+                    gauges += [(name, dict(labels, pid=str(row['pid'])), value)
+                               for name, labels, value in json.loads(row['gauges'])]
+            if exited:
+                connection.executemany("DELETE FROM metrics WHERE instance = ?", [(name,) for name in exited])
+                connection.execute(
+                    "INSERT OR REPLACE INTO metrics (instance, pid, data, gauges, updated_at) VALUES (?, 0, ?, '[]', ?)",
+                    (RETIRED_METRICS, json.dumps(retired.snapshot()), time.time())
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    return combined.render(METRIC_HELP, gauges)
+
+METRIC_HELP = {
+    'mlapp_request_duration_seconds': 'Time from request start until the response headers were ready',
+    'mlapp_phase_duration_seconds': 'Time spent in a phase of request or job handling',
+    'mlapp_phase_rows_total': 'Rows processed by a phase',
+    'mlapp_phase_bytes_total': 'Bytes processed by a phase (in-memory size for frames, payload size otherwise)',
+}
+
+# Spans recorded while a process-pool job runs, handed back to the submitting worker
+_job_spans = None
+
+def record_span(phase, seconds, rows=None, nbytes=None):
+    """Record a finished phase in the metrics and in the current request's Server-Timing"""
+    if not METRICS_ENABLED:
+        return
+    metrics.observe('mlapp_phase_duration_seconds', seconds, phase=phase)
+    if rows is not None:
+        metrics.inc('mlapp_phase_rows_total', int(rows), phase=phase)
+    if nbytes is not None:
+        metrics.inc('mlapp_phase_bytes_total', int(nbytes), phase=phase)
+    if _job_spans is not None:
+        _job_spans.append((phase, seconds, rows, nbytes))
+    if has_request_context():
+        timings = g.setdefault('server_timing', {})
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+@contextmanager
+def span(phase):
+    """Time a block as a phase; set 'rows' / 'bytes' on the yielded dict to count them too"""
+    info = {}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record_span(phase, time.perf_counter() - start, info.get('rows'), info.get('bytes'))
+
+def metric_gauges():
+    """This worker's existing pool and cache counters as (name, labels, value) gauges"""
+    gauges = []
+    groups = {'db_pool': db_pool_stats(), 'dataframe_cache': dataframe_cache.snapshot(),
+              'model_cache': model_cache.snapshot(), 'upload_dedup': upload_dedup_snapshot()}
+    for group, stats in groups.items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and key != 'pid':
+                gauges.append((f'mlapp_{group}_{key}', {}, value))
+    return gauges
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT seconds"""
+
+class SqliteCursor:
+    """sqlite3 cursor taking the %s placeholders the app writes for its server databases"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.cursor()
+
+    def _begin(self, sql):
+        # Like psycopg2, every statement (DDL included) runs inside a transaction that lasts
+        # until commit() or rollback(), so a failed save leaves nothing behind. A transaction
+        # that starts with a write takes the write lock at once (IMMEDIATE): upgrading a read
+        # transaction fails with SQLITE_BUSY straight away instead of waiting for busy_timeout
+        if not self._connection.in_transaction:
+            is_read = sql.lstrip()[:6].upper() == 'SELECT'
+            self._cursor.execute("BEGIN" if is_read else "BEGIN IMMEDIATE")
+
+    def execute(self, sql, params=()):
+        self._begin(sql)
+        self._cursor.execute(sql.replace('%s', '?'), params)
+        return self
+
+    def executemany(self, sql, rows):
+        self._begin(sql)
+        self._cursor.executemany(sql.replace('%s', '?'), rows)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class SqliteConnection:
+    """sqlite3 connection with the DB-API behaviour the rest of the app relies on"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return SqliteCursor(self._connection)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+def begin_write(connection):
+    """Start a transaction that reads before it writes.
+
+    On SQLite it takes the write lock up front, so contention with another worker waits for
+    busy_timeout instead of failing when the read lock is upgraded. Other databases lock rows
+    as they are written and need nothing here.
+    """
+    if DB_TYPE == 'sqlite' and not connection.in_transaction:
+        connection.execute("BEGIN IMMEDIATE")
+
+def connect_sqlite():
+    """Open the SQLite database in WAL mode: readers never block the single writer"""
+    connection = sqlite3.connect(DB_CONFIG['database'], timeout=DB_CONFIG['timeout'],
+                                 isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only syncs at checkpoints; a power loss can drop the last commits but never corrupts
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return SqliteConnection(connection)
+
+def connect_database():
+    """Open a brand-new, unpooled database connection"""
+    if DB_TYPE == 'postgresql':
+        # PostgreSQL connection
+        connection = psycopg2.connect(DB_CONFIG)
+        connection.autocommit = False
+    elif DB_TYPE == 'sqlite':
+        connection = connect_sqlite()
+    else:
+        # MySQL connection
+        connection = mysql.connector.connect(**DB_CONFIG)
+    return connection
+
+class PooledConnection:
+    """Proxy around a pooled connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+class ConnectionPool:
+    """Process-wide, thread-safe pool of database connections with blocking checkout and stats.
+
+    One implementation serves both drivers so sizing, health checks and stats behave the same;
+    connections are opened lazily up to max_size and checked out via get_db_connection().
+    """
+
+    def __init__(self, connect, min_size, max_size, timeout, ping_after):
+        self._connect = connect
+        self._idle = deque()  # (connection, last released at)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self.stats = {
+            'created': 0,
+            'discarded': 0,
+            'checked_out': 0,
+            'checkouts': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        connection = self._connect()
+        with self._lock:
+            self.stats['created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self.stats['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection, idle_seconds):
+        """Cheap liveness check; round-trips to the server only after ping_after idle seconds"""
+        try:
+            if DB_TYPE == 'postgresql':
+                if connection.closed:
+                    return False
+                if idle_seconds >= self.ping_after:
+                    cursor = connection.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.close()
+                    connection.rollback()
+            elif DB_TYPE == 'mysql' and idle_seconds >= self.ping_after:
+                connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Check out a healthy connection, waiting up to timeout seconds for a free slot"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise PoolTimeoutError(f"no database connection free after {self.timeout}s")
+        waited = time.perf_counter() - start
+        try:
+            connection = None
+            while connection is None:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    connection = self._new_connection()
+                elif self._is_healthy(idle[0], time.monotonic() - idle[1]):
+                    connection = idle[0]
+                else:
+                    self._discard(idle[0])
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.stats['checked_out'] += 1
+            self.stats['checkouts'] += 1
+            self.stats['wait_seconds_total'] += waited
+            self.stats['wait_seconds_max'] = max(self.stats['wait_seconds_max'], waited)
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """Return a connection to the pool, rolling back any transaction left open"""
+        try:
+            connection.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        if healthy:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        else:
+            self._discard(connection)
+        with self._lock:
+            self.stats['checked_out'] -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        """Return a copy of the pool counters for monitoring"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['idle'] = len(self._idle)
+        stats.update({'min_size': self.min_size, 'max_size': self.max_size, 'pid': self.pid})
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+# Pools inherited from a parent process: kept referenced so garbage collection in the
+# child never closes (and thereby terminates) sockets that still belong to the parent
+_inherited_db_pools = []
+
+def _reset_db_pool_after_fork():
+    """Give each forked gunicorn worker its own pool instead of sharing the parent's sockets"""
+    global _db_pool, _db_pool_lock
+    if _db_pool is not None:
+        _inherited_db_pools.append(_db_pool)
+    _db_pool = None
+    _db_pool_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_db_pool_after_fork)
+
+def get_db_pool():
+    """Return this process's connection pool, creating it on first use"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None or _db_pool.pid != os.getpid():
+            if _db_pool is not None:
+                _inherited_db_pools.append(_db_pool)
+            _db_pool = ConnectionPool(connect_database, DB_POOL_MIN, DB_POOL_MAX,
+                                      DB_POOL_TIMEOUT, DB_POOL_PING_AFTER)
+        return _db_pool
+
+def get_db_connection():
+    """Check out a pooled database connection (MySQL, PostgreSQL or SQLite).
+
+    Callers must call close() on the result, which returns it to the pool.
+    """
+    try:
+        return get_db_pool().acquire()
+    except (Error, PoolTimeoutError) as e:
+        print(f"Error connecting to {DB_TYPE}: {e}")
+        return None
+
+def db_pool_stats():
+    """Pool counters for monitoring (empty until the first connection is requested)"""
+    return _db_pool.snapshot() if _db_pool is not None else {}
+
+def init_database():
+    """Initialize the database if it doesn't exist"""
+    try:
+        if DB_TYPE == 'postgresql':
+            # PostgreSQL: Database is already created by Render
+            conn = get_db_connection()
+            if conn:
+                print(f"Database connection is ready (PostgreSQL).")
+                conn.close()
+        elif DB_TYPE == 'sqlite':
+            # SQLite: the file is created on first connect
+            conn = get_db_connection()
+            if conn:
+                print(f"Database '{DB_CONFIG['database']}' is ready (SQLite).")
+                conn.close()
+        else:
+            # MySQL: Create database if it doesn't exist
+            conn = mysql.connector.connect(
+                host=DB_CONFIG['host'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password']
+            )
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
+            cursor.close()
+            conn.close()
+            print(f"Database '{DB_CONFIG['database']}' is ready (MySQL).")
+    except Error as e:
+        print(f"Error creating database: {e}")
+
+_metadata_tables_ready = False
+
+def ensure_metadata_tables(connection):
+    """Create the app's bookkeeping tables once per process"""
+    global _metadata_tables_ready
+    if _metadata_tables_ready:
+        return
+    cursor = connection.cursor()
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATASET_VERSIONS_TABLE} ("
+        f"table_name VARCHAR(255) PRIMARY KEY, version BIGINT NOT NULL)"
+    )
+    blob_type = {'postgresql': 'BYTEA', 'sqlite': 'BLOB'}.get(DB_TYPE, 'LONGBLOB')
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {MODELS_TABLE} ("
+        f"model_id VARCHAR(64) PRIMARY KEY, algorithm VARCHAR(32) NOT NULL, "
+        f"target_column TEXT NOT NULL, feature_columns TEXT NOT NULL, "
+        f"model_blob {blob_type} NOT NULL, created_at DOUBLE PRECISION NOT NULL)"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATASET_SCHEMAS_TABLE} ("
+        f"table_name VARCHAR(255) PRIMARY KEY, columns_json TEXT NOT NULL)"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATASET_TABLES_TABLE} ("
+        f"physical_name VARCHAR(255) PRIMARY KEY, table_name VARCHAR(255) NOT NULL, "
+        f"created_at DOUBLE PRECISION NOT NULL, retired_at DOUBLE PRECISION)"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATASET_REGISTRY_TABLE} ("
+        f"table_name VARCHAR(255) PRIMARY KEY, owner VARCHAR(255), "
+        f"created_at DOUBLE PRECISION NOT NULL, last_access DOUBLE PRECISION NOT NULL, "
+        f"row_count BIGINT NOT NULL DEFAULT 0, size_bytes BIGINT NOT NULL DEFAULT 0)"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATASET_CONTENTS_TABLE} ("
+        f"content_key VARCHAR(80) PRIMARY KEY, table_name VARCHAR(255) NOT NULL, "
+        f"hits BIGINT NOT NULL DEFAULT 0, created_at DOUBLE PRECISION NOT NULL)"
+    )
+    cursor.close()
+    connection.commit()
+    _metadata_tables_ready = True
+
+def get_table_version(connection, table_name):
+    """Return the committed version of a dataset table (0 if it was never saved)"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT version FROM {DATASET_VERSIONS_TABLE} WHERE table_name = %s", (table_name,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else 0
+
+def resolve_table(connection, table_name):
+    """Return (version, physical table) of a dataset, read in one statement so they always match.
+
+    Datasets saved before physical tables were versioned are read under their own name.
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT v.version, t.physical_name FROM {DATASET_VERSIONS_TABLE} v "
+        f"LEFT JOIN {DATASET_TABLES_TABLE} t ON t.table_name = v.table_name AND t.retired_at IS NULL "
+        f"WHERE v.table_name = %s",
+        (table_name,)
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        return 0, table_name
+    return row[0], row[1] or table_name
+
+def new_physical_table_name(table_name):
+    return f"{table_name}__{uuid.uuid4().hex[:8]}"
+
+def publish_table(cursor, table_name, physical_name, schema):
+    """Point a dataset at a fully loaded physical table inside the caller's transaction.
+
+    The table it replaces is only marked retired, so readers that resolved it a moment
+    ago can finish; collect_retired_tables() drops it once the retention window passes.
+    """
+    now = time.time()
+    cursor.execute(
+        f"UPDATE {DATASET_TABLES_TABLE} SET retired_at = %s WHERE table_name = %s AND retired_at IS NULL",
+        (now, table_name)
+    )
+    if cursor.rowcount == 0:
+        # A dataset saved before versioning lives under its own name; retire that table too
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {DATASET_VERSIONS_TABLE} v WHERE v.table_name = %s AND NOT EXISTS "
+            f"(SELECT 1 FROM {DATASET_TABLES_TABLE} t WHERE t.physical_name = v.table_name)",
+            (table_name,)
+        )
+        if cursor.fetchone()[0]:
+            cursor.execute(
+                f"INSERT INTO {DATASET_TABLES_TABLE} (physical_name, table_name, created_at, retired_at) "
+                f"VALUES (%s, %s, %s, %s)",
+                (table_name, table_name, now, now)
+            )
+    cursor.execute(
+        f"INSERT INTO {DATASET_TABLES_TABLE} (physical_name, table_name, created_at, retired_at) "
+        f"VALUES (%s, %s, %s, NULL)",
+        (physical_name, table_name, now)
+    )
+    save_table_schema(cursor, physical_name, schema)
+    # New version in the same transaction, so no reader can cache the old rows under it
+    bump_table_version(cursor, table_name)
+
+def drop_table_quietly(connection, physical_name):
+    """Best-effort DROP of a physical table, e.g. one a failed save left behind"""
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {physical_name}")
+        cursor.close()
+        connection.commit()
+    except Error as e:
+        print(f"Error dropping table {physical_name}: {e}")
+        connection.rollback()
+
+def collect_retired_tables(connection, retention=None):
+    """Drop physical tables replaced more than `retention` seconds ago; returns how many were dropped"""
+    retention = DATASET_VERSION_RETENTION if retention is None else retention
+    try:
+        begin_write(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT physical_name FROM {DATASET_TABLES_TABLE} WHERE retired_at IS NOT NULL AND retired_at <= %s",
+            (time.time() - retention,)
+        )
+        names = [row[0] for row in cursor.fetchall()]
+        for name in names:
+            # One transaction per table keeps each DROP's lock short
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+            cursor.execute(f"DELETE FROM {DATASET_SCHEMAS_TABLE} WHERE table_name = %s", (name,))
+            cursor.execute(f"DELETE FROM {DATASET_TABLES_TABLE} WHERE physical_name = %s", (name,))
+            connection.commit()
+        cursor.close()
+        return len(names)
+    except Error as e:
+        print(f"Error dropping retired tables: {e}")
+        connection.rollback()
+        return 0
+
+def new_dataset_name():
+    """Collision-free table name for a new dataset"""
+    return f"{DATASET_PREFIX}{uuid.uuid4().hex}"
+
+def register_dataset(cursor, table_name, owner, rows, nbytes):
+    """Record a saved dataset's owner and size inside the caller's transaction; a save counts as an access"""
+    now = time.time()
+    values = (table_name, owner, now, now, rows, nbytes)
+    if DB_TYPE in ('postgresql', 'sqlite'):
+        cursor.execute(
+            f"INSERT INTO {DATASET_REGISTRY_TABLE} (table_name, owner, created_at, last_access, row_count, size_bytes) "
+            f"VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (table_name) DO UPDATE SET "
+            f"owner = COALESCE(EXCLUDED.owner, {DATASET_REGISTRY_TABLE}.owner), last_access = EXCLUDED.last_access, "
+            f"row_count = EXCLUDED.row_count, size_bytes = EXCLUDED.size_bytes",
+            values
+        )
+    else:
+        cursor.execute(
+            f"INSERT INTO {DATASET_REGISTRY_TABLE} (table_name, owner, created_at, last_access, row_count, size_bytes) "
+            f"VALUES (%s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+            f"owner = COALESCE(VALUES(owner), owner), last_access = VALUES(last_access), "
+            f"row_count = VALUES(row_count), size_bytes = VALUES(size_bytes)",
+            values
+        )
+
+_dataset_touches = {}
+
+def touch_dataset(table_name):
+    """Record that a dataset is still in use, at most once per DATASET_TOUCH_INTERVAL per worker"""
+    now = time.time()
+    if now - _dataset_touches.get(table_name, 0) < DATASET_TOUCH_INTERVAL:
+        return
+    if len(_dataset_touches) > 10000:
+        _dataset_touches.clear()
+    _dataset_touches[table_name] = now
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"UPDATE {DATASET_REGISTRY_TABLE} SET last_access = %s WHERE table_name = %s", (now, table_name))
+        cursor.close()
+        connection.commit()
+    except Error as e:
+        print(f"Error recording dataset access: {e}")
+    finally:
+        if connection:
+            connection.close()
+
+def dataset_ttl():
+    """Seconds without access after which a dataset is expired.
+
+    Sessions expire PERMANENT_SESSION_LIFETIME after their last request, and last access
+    lags a request by at most DATASET_TOUCH_INTERVAL, so no live session can still hold it.
+    """
+    return app.config['PERMANENT_SESSION_LIFETIME'].total_seconds() + DATASET_TOUCH_INTERVAL
+
+def list_catalog_tables(connection):
+    """Names of all tables in the app's database"""
+    cursor = connection.cursor()
+    if DB_TYPE == 'postgresql':
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")
+    elif DB_TYPE == 'sqlite':
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    else:
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    names = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return names
+
+def adopt_unregistered_datasets(connection):
+    """Register datasets that hold data but have no registry row, as accessed now.
+
+    These are datasets saved before the registry existed, tables left by crashed saves and
+    columnar-store directories; from now on they expire like any other dataset.
+    """
+    begin_write(connection)
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT table_name FROM {DATASET_REGISTRY_TABLE}")
+    known = {row[0] for row in cursor.fetchall()}
+    # Physical tables belong to their dataset's entry
+    cursor.execute(f"SELECT physical_name FROM {DATASET_TABLES_TABLE}")
+    known.update(row[0] for row in cursor.fetchall())
+    cursor.execute(f"SELECT table_name FROM {DATASET_VERSIONS_TABLE}")
+    candidates = {row[0] for row in cursor.fetchall()}
+    candidates.update(name for name in list_catalog_tables(connection) if name.startswith(DATASET_PREFIX))
+    if DATASET_STORAGE != 'sql':
+        candidates.update(get_dataset_store().tables())
+    adopted = sorted(candidates - known)
+    for name in adopted:
+        nbytes = get_dataset_store().size(name) if DATASET_STORAGE != 'sql' else 0
+        register_dataset(cursor, name, None, 0, nbytes)
+    cursor.close()
+    connection.commit()
+    return adopted
+
+def drop_dataset(cursor, table_name):
+    """Drop a dataset's physical tables and metadata rows inside the caller's transaction"""
+    cursor.execute(f"SELECT physical_name FROM {DATASET_TABLES_TABLE} WHERE table_name = %s", (table_name,))
+    for name in {row[0] for row in cursor.fetchall()} | {table_name}:
+        cursor.execute(f"DROP TABLE IF EXISTS {name}")
+        cursor.execute(f"DELETE FROM {DATASET_SCHEMAS_TABLE} WHERE table_name = %s", (name,))
+    cursor.execute(f"DELETE FROM {DATASET_TABLES_TABLE} WHERE table_name = %s", (table_name,))
+    cursor.execute(f"DELETE FROM {DATASET_VERSIONS_TABLE} WHERE table_name = %s", (table_name,))
+    cursor.execute(f"DELETE FROM {DATASET_CONTENTS_TABLE} WHERE table_name = %s", (table_name,))
+
+def list_datasets():
+    """Registry rows (unregistered datasets adopted first) as dicts, least recently used first"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Error('Could not connect to the database')
+    try:
+        ensure_metadata_tables(connection)
+        adopt_unregistered_datasets(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT table_name, owner, created_at, last_access, row_count, size_bytes "
+            f"FROM {DATASET_REGISTRY_TABLE} ORDER BY last_access"
+        )
+        keys = ('table_name', 'owner', 'created_at', 'last_access', 'rows', 'size_bytes')
+        datasets = [dict(zip(keys, row)) for row in cursor.fetchall()]
+        cursor.close()
+        return datasets
+    finally:
+        connection.close()
+
+def sweep_expired_datasets(max_age=None):
+    """Drop datasets not accessed for max_age seconds (default dataset_ttl()).
+
+    Returns the dropped registry rows as (table name, size in bytes).
+    """
+    max_age = dataset_ttl() if max_age is None else max_age
+    connection = get_db_connection()
+    if connection is None:
+        raise Error('Could not connect to the database')
+    dropped = []
+    try:
+        ensure_metadata_tables(connection)
+        adopt_unregistered_datasets(connection)
+        cutoff = time.time() - max_age
+        begin_write(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT table_name, size_bytes FROM {DATASET_REGISTRY_TABLE} WHERE last_access < %s", (cutoff,)
+        )
+        for table_name, nbytes in cursor.fetchall():
+            # Claim the dataset first: an access since the SELECT, or another worker's sweep, wins
+            cursor.execute(
+                f"DELETE FROM {DATASET_REGISTRY_TABLE} WHERE table_name = %s AND last_access < %s",
+                (table_name, cutoff)
+            )
+            if cursor.rowcount == 0:
+                connection.rollback()
+                continue
+            # A table adopted while its save was running may since have been published
+            cursor.execute(f"SELECT COUNT(*) FROM {DATASET_TABLES_TABLE} WHERE physical_name = %s", (table_name,))
+            if not cursor.fetchone()[0]:
+                drop_dataset(cursor, table_name)
+            connection.commit()
+            if DATASET_STORAGE != 'sql':
+                get_dataset_store().drop(table_name)
+            dataframe_cache.invalidate(table_name)
+            dropped.append((table_name, nbytes))
+        cursor.close()
+        collect_retired_tables(connection)
+        return dropped
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+def start_dataset_sweeper():
+    """Start this worker's background sweeper once (threads do not survive a fork)"""
+    global _sweeper_pid
+    if DATASET_SWEEP_INTERVAL <= 0 or _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+    threading.Thread(target=sweep_datasets_forever, name='dataset-sweeper', daemon=True).start()
+
+def sweep_datasets_forever():
+    while True:
+        time.sleep(DATASET_SWEEP_INTERVAL)
+        try:
+            dropped = sweep_expired_datasets()
+            if dropped:
+                print(f"Dropped {len(dropped)} expired datasets ({sum(n for _, n in dropped):,} bytes)")
+        except Exception as e:
+            print(f"Error sweeping expired datasets: {e}")
+
+def index_dataset_content(content_key, table_name):
+    """Map an upload's content key to the dataset it was stored as"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        if DB_TYPE in ('postgresql', 'sqlite'):
+            cursor.execute(
+                f"INSERT INTO {DATASET_CONTENTS_TABLE} (content_key, table_name, hits, created_at) "
+                f"VALUES (%s, %s, 0, %s) ON CONFLICT (content_key) DO UPDATE SET table_name = EXCLUDED.table_name",
+                (content_key, table_name, time.time())
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {DATASET_CONTENTS_TABLE} (content_key, table_name, hits, created_at) "
+                f"VALUES (%s, %s, 0, %s) ON DUPLICATE KEY UPDATE table_name = VALUES(table_name)",
+                (content_key, table_name, time.time())
+            )
+        cursor.close()
+        connection.commit()
+    except Error as e:
+        print(f"Error indexing dataset content: {e}")
+    finally:
+        if connection:
+            connection.close()
+
+def claim_dataset_by_content(content_key):
+    """Name of a live dataset stored from identical content, or None.
+
+    The dataset is marked accessed in the same statement that checks it is still
+    registered, so a concurrent sweep either loses the race or is seen as a miss.
+    """
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None
+        ensure_metadata_tables(connection)
+        begin_write(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT table_name FROM {DATASET_CONTENTS_TABLE} WHERE content_key = %s", (content_key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(f"UPDATE {DATASET_REGISTRY_TABLE} SET last_access = %s WHERE table_name = %s",
+                       (time.time(), row[0]))
+        if cursor.rowcount == 0:
+            connection.rollback()
+            return None
+        cursor.execute(f"UPDATE {DATASET_CONTENTS_TABLE} SET hits = hits + 1 WHERE content_key = %s", (content_key,))
+        cursor.close()
+        connection.commit()
+        return row[0]
+    except Error as e:
+        print(f"Error looking up dataset content: {e}")
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+def upload_dedup_totals():
+    """Indexed upload contents and the uploads they have absorbed, across all workers"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Error('Could not connect to the database')
+    try:
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM {DATASET_CONTENTS_TABLE}")
+        contents, hits = cursor.fetchone()
+        cursor.close()
+        return {'indexed': int(contents), 'hits': int(hits)}
+    finally:
+        connection.close()
+
+upload_dedup_stats = {'hits': 0, 'misses': 0}
+_upload_dedup_lock = threading.Lock()
+
+def record_upload_dedup(hit):
+    with _upload_dedup_lock:
+        upload_dedup_stats['hits' if hit else 'misses'] += 1
+
+def upload_dedup_snapshot():
+    """This worker's dedup hit/miss counters and hit rate"""
+    with _upload_dedup_lock:
+        stats = dict(upload_dedup_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+def bump_table_version(cursor, table_name):
+    """Increment a dataset table's version inside the caller's transaction"""
+    if DB_TYPE in ('postgresql', 'sqlite'):
+        cursor.execute(
+            f"INSERT INTO {DATASET_VERSIONS_TABLE} (table_name, version) VALUES (%s, 1) "
+            f"ON CONFLICT (table_name) DO UPDATE SET version = {DATASET_VERSIONS_TABLE}.version + 1",
+            (table_name,)
+        )
+    else:
+        cursor.execute(
+            f"INSERT INTO {DATASET_VERSIONS_TABLE} (table_name, version) VALUES (%s, 1) "
+            f"ON DUPLICATE KEY UPDATE version = version + 1",
+            (table_name,)
+        )
+
+class DataFrameCache:
+    """LRU cache of loaded DataFrames keyed by table name, bounded by total deep memory usage.
+
+    Entries are tagged with the table version they were read at; a lookup with any other
+    version is a miss, so a save from any worker invalidates every worker's copy.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # table_name -> (version, df, nbytes)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, table_name, version):
+        """Return a private copy of the cached frame, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry is None or entry[0] != version:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(table_name)
+            self.stats['hits'] += 1
+            df = entry[1]
+        return df.copy()
+
+    def contains(self, table_name, version):
+        """True if the table is cached at this version (does not count as a hit or miss)"""
+        with self._lock:
+            entry = self._entries.get(table_name)
+            return entry is not None and entry[0] == version
+
+    def put(self, table_name, version, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            self.invalidate(table_name)
+            return
+        with self._lock:
+            self._pop(table_name)
+            self._entries[table_name] = (version, df, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def invalidate(self, table_name):
+        with self._lock:
+            if self._pop(table_name):
+                self.stats['invalidations'] += 1
+
+    def _pop(self, table_name):
+        entry = self._entries.pop(table_name, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+        return entry
+
+    def snapshot(self):
+        """Return cache counters for monitoring"""
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries),
+                        total_bytes=self.total_bytes, max_bytes=self.max_bytes)
+
+dataframe_cache = DataFrameCache(DATAFRAME_CACHE_BYTES)
+
+class ModelCache:
+    """LRU cache of deserialized model records keyed by model id (records never change)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, model_id):
+        with self._lock:
+            record = self._entries.get(model_id)
+            if record is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(model_id)
+            self.stats['hits'] += 1
+            return record
+
+    def put(self, model_id, record):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[model_id] = record
+            self._entries.move_to_end(model_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def snapshot(self):
+        """Return cache counters for monitoring"""
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries)
+
+model_cache = ModelCache(MODEL_CACHE_SIZE)
+
+def compile_scorer(record):
+    """NumPy scorer for a model record, or None when disabled or unsupported"""
+    if not FAST_LINEAR_SCORER:
+        return None
+    from linear_scorer import compile_linear_scorer
+    return compile_linear_scorer(record['model'], record['feature_columns'])
+
+def save_model(model, algorithm, target, feature_columns):
+    """Persist a fitted estimator and its feature column order; returns the new model id"""
+    model_id = uuid.uuid4().hex
+    record = {
+        'model': model,
+        'algorithm': algorithm,
+        'target_column': target,
+        'feature_columns': list(feature_columns),
+    }
+    record['scorer'] = compile_scorer(record)
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None
+        ensure_metadata_tables(connection)
+        with span('model_save') as info:
+            blob = pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+            info['bytes'] = len(blob)
+            cursor = connection.cursor()
+            cursor.execute(
+                f"INSERT INTO {MODELS_TABLE} "
+                f"(model_id, algorithm, target_column, feature_columns, model_blob, created_at) "
+                f"VALUES (%s, %s, %s, %s, %s, %s)",
+                (model_id, algorithm, target, json.dumps(record['feature_columns']), blob, time.time())
+            )
+            connection.commit()
+        cursor.close()
+        model_cache.put(model_id, record)
+        return model_id
+    except Error as e:
+        print(f"Error saving model to database: {e}")
+        if connection:
+            connection.rollback()
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+def load_model(model_id):
+    """Return the stored model record for model_id, deserializing it at most once per worker"""
+    record = model_cache.get(model_id)
+    if record is not None:
+        return record
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT algorithm, target_column, feature_columns, model_blob "
+            f"FROM {MODELS_TABLE} WHERE model_id = %s",
+            (model_id,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        if row is None:
+            return None
+        with span('model_load') as info:
+            blob = bytes(row[3])
+            info['bytes'] = len(blob)
+            model = pickle.loads(blob)
+        record = {
+            'model': model,
+            'algorithm': row[0],
+            'target_column': row[1],
+            'feature_columns': json.loads(row[2]),
+        }
+        record['scorer'] = compile_scorer(record)
+        model_cache.put(model_id, record)
+        return record
+    except Error as e:
+        print(f"Error loading model from database: {e}")
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+def build_model(algorithm, **params):
+    """Return an unfitted estimator for the given algorithm name and hyperparameters"""
+    from sklearn.linear_model import LinearRegression, Ridge, Lasso, LogisticRegression
+    if algorithm == 'linear':
+        return LinearRegression(**params)
+    elif algorithm == 'ridge':
+        return Ridge(**params)
+    elif algorithm == 'lasso':
+        return Lasso(**params)
+    elif algorithm == 'logistic':
+        return LogisticRegression(max_iter=1000, **params)
+    raise ValueError(f'Unknown algorithm: {algorithm}')
+
+def build_incremental_model(algorithm, random_state=None):
+    """Return an unfitted SGD estimator standing in for the given algorithm (supports partial_fit)"""
+    from sklearn.linear_model import SGDRegressor, SGDClassifier
+    if algorithm == 'logistic':
+        return SGDClassifier(loss='log_loss', random_state=random_state)
+    penalties = {'linear': None, 'ridge': 'l2', 'lasso': 'l1'}
+    if algorithm not in penalties:
+        raise ValueError(f'Unknown algorithm: {algorithm}')
+    return SGDRegressor(penalty=penalties[algorithm], random_state=random_state)
+
+def detach_upload_stream(file):
+    """Take ownership of an uploaded file's stream so it can be read after the view returns.
+
+    Flask closes request files when the request context is popped, which happens before
+    a streamed response body is iterated.
+    """
+    stream = file.stream
+    file.stream = io.BytesIO()
+    return stream
+
+def iter_stream_chunks(stream, reader):
+    """Yield chunks from a chunked pandas reader, closing the underlying stream when done"""
+    try:
+        yield from reader
+    finally:
+        stream.close()
+
+def read_batch_input(chunk_rows=None):
+    """Return an iterator of input DataFrame chunks from the current request.
+
+    Accepts a CSV or JSON-lines file upload (read incrementally) or a JSON array body.
+    """
+    chunk_rows = chunk_rows or PREDICT_CHUNK_ROWS
+    if 'file' in request.files:
+        file = request.files['file']
+        file_ext = secure_filename(file.filename).rsplit('.', 1)[-1].lower()
+        if file_ext not in BATCH_INPUT_EXTENSIONS:
+            raise ValueError('Invalid file type. Only CSV and JSON lines (.jsonl, .ndjson) are allowed.')
+        stream = detach_upload_stream(file)
+        if file_ext == 'csv':
+            reader = pd.read_csv(stream, chunksize=chunk_rows)
+        else:
+            reader = pd.read_json(stream, lines=True, chunksize=chunk_rows)
+        return iter_stream_chunks(stream, reader)
+    data = request.get_json(silent=True)
+    rows = data if isinstance(data, list) else (data or {}).get('rows', [])
+    return iter_dataframe_batches(pd.DataFrame(rows), chunk_rows)
+
+def iter_batch_predictions(record, chunks, output_format='csv'):
+    """Score DataFrame chunks with a stored model, yielding CSV or NDJSON text per chunk"""
+    feature_columns = record['feature_columns']
+    model = record.get('scorer') or record['model']
+    for i, chunk in enumerate(chunks):
+        missing = [col for col in feature_columns if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(map(str, missing))}")
+        with span('predict') as info:
+            info['rows'] = len(chunk)
+            chunk = chunk.assign(prediction=model.predict(chunk[feature_columns]))
+        if output_format == 'ndjson':
+            text = chunk.to_json(orient='records', lines=True)
+            yield text if text.endswith('\n') else text + '\n'
+        else:
+            yield chunk.to_csv(index=False, header=(i == 0))
+
+def quote_identifier(name):
+    """Quote a column name for the active database"""
+    if DB_TYPE in ('postgresql', 'sqlite'):
+        return '"{}"'.format(str(name).replace('"', '""'))
+    return '`{}`'.format(str(name).replace('`', '``'))
+
+def iter_dataframe_batches(df, batch_size=None):
+    """Yield successive row slices of a DataFrame of at most batch_size rows"""
+    batch_size = batch_size or DB_INSERT_BATCH_SIZE
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+def dataframe_to_records(df):
+    """Convert a DataFrame into a list of tuples of plain Python values (NaN -> None)"""
+    return list(df.astype(object).where(pd.notna(df), None).itertuples(index=False, name=None))
+
+def quoted_csv_text(df, escape_backslashes=False):
+    """CSV text for a DataFrame in which every present value is quoted and every missing one
+    is the bare COPY_NULL_MARKER.
+
+    Only an unquoted marker loads as NULL, so a cell holding the text "\\N" or "NULL" stays a
+    string. MySQL also treats backslash as its escape character, so it asks for them doubled.
+    """
+    fields = []
+    for col in df.columns:
+        text = df[col].astype(str)
+        if escape_backslashes:
+            text = text.str.replace('\\', '\\\\', regex=False)
+        text = '"' + text.str.replace('"', '""', regex=False) + '"'
+        fields.append(text.where(df[col].notna(), COPY_NULL_MARKER))
+    rows = fields[0].str.cat(fields[1:], sep=',') if len(fields) > 1 else fields[0]
+    return '\n'.join(rows) + '\n'
+
+def copy_dataframe_postgresql(cursor, df, table_name, columns_sql, batch_size=None):
+    """Stream a DataFrame into PostgreSQL with COPY FROM STDIN, one CSV buffer per batch"""
+    copy_sql = (f"COPY {table_name} ({columns_sql}) FROM STDIN "
+                f"WITH (FORMAT csv, NULL '{COPY_NULL_MARKER}')")
+    for batch in iter_dataframe_batches(df, batch_size):
+        buffer = io.StringIO(quoted_csv_text(batch))
+        cursor.copy_expert(copy_sql, buffer)
+
+def load_data_local_mysql(cursor, df, table_name, columns_sql, batch_size=None):
+    """Bulk load a DataFrame into MySQL with LOAD DATA LOCAL INFILE, one temp file per batch"""
+    for batch in iter_dataframe_batches(df, batch_size):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as tmp:
+            batch = batch.astype({col: 'int8' for col in batch.columns if batch[col].dtype == bool})
+            tmp.write(quoted_csv_text(batch, escape_backslashes=True))
+            tmp_path = tmp.name
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table_name} "
+                f"FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ({columns_sql})",
+                (tmp_path,)
+            )
+        finally:
+            os.remove(tmp_path)
+
+def insert_dataframe_batches(cursor, df, table_name, columns_sql, batch_size=None):
+    """Insert a DataFrame with multi-row executemany batches"""
+    placeholders = ', '.join(['%s'] * len(df.columns))
+    insert_sql = f"INSERT INTO {table_name} ({columns_sql}) VALUES ({placeholders})"
+    for batch in iter_dataframe_batches(df, batch_size):
+        cursor.executemany(insert_sql, dataframe_to_records(batch))
+
+def datetimes_as_text(df):
+    """df with datetime columns as ISO-8601 strings (SQLite has no datetime type)"""
+    columns = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+    if not columns:
+        return df
+    df = df.copy()
+    for col in columns:
+        df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return df
+
+def bulk_insert_dataframe(cursor, df, table_name, batch_size=None):
+    """Load all rows of a DataFrame into an existing table using the fastest path for DB_TYPE"""
+    if df.empty:
+        return
+    columns_sql = ', '.join(quote_identifier(col) for col in df.columns)
+    if DB_TYPE == 'postgresql':
+        copy_dataframe_postgresql(cursor, df, table_name, columns_sql, batch_size)
+    elif DB_TYPE == 'sqlite':
+        # executemany inside the save's single transaction is SQLite's fastest bulk path
+        insert_dataframe_batches(cursor, datetimes_as_text(df), table_name, columns_sql, batch_size)
+    elif MYSQL_LOAD_DATA_LOCAL:
+        load_data_local_mysql(cursor, df, table_name, columns_sql, batch_size)
+    else:
+        insert_dataframe_batches(cursor, df, table_name, columns_sql, batch_size)
+
+# Column storage kinds. Numeric kinds widen along NUMERIC_KINDS as later chunks need more
+# range; any other mismatch falls back to 'text'. Category columns are stored as TEXT.
+INTEGER_KINDS = ('int16', 'int32', 'int64')
+NUMERIC_KINDS = INTEGER_KINDS + ('float',)
+
+def column_kind(series):
+    """Storage kind for a pandas column: bool, int16/int32/int64 (by value range), float,
+    datetime, category or text"""
+    # Determine SQL data type based on pandas dtype
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'bool'
+    elif pd.api.types.is_integer_dtype(dtype):
+        values = series.dropna()
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        for kind in INTEGER_KINDS[:-1]:
+            info = np.iinfo(kind)
+            if info.min <= low and high <= info.max:
+                return kind
+        return 'int64'
+    elif pd.api.types.is_float_dtype(dtype):
+        return 'float'
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    elif isinstance(dtype, pd.CategoricalDtype):
+        return 'category'
+    return 'text'
+
+def widest_kind(current, new):
+    """The narrowest storage kind that can hold values of both kinds"""
+    if current == new:
+        return current
+    if current in NUMERIC_KINDS and new in NUMERIC_KINDS:
+        return max(current, new, key=NUMERIC_KINDS.index)
+    return 'text'
+
+def sql_type_for_kind(kind):
+    """SQL column type for a storage kind on the active database"""
+    if kind == 'bool':
+        return 'BOOLEAN'
+    elif kind == 'int16':
+        return 'SMALLINT'
+    elif kind == 'int32':
+        return 'INT' if DB_TYPE == 'mysql' else 'INTEGER'
+    elif kind == 'int64':
+        return 'BIGINT'
+    elif kind == 'float':
+        return {'postgresql': 'DOUBLE PRECISION', 'sqlite': 'REAL'}.get(DB_TYPE, 'DOUBLE')
+    elif kind == 'datetime':
+        # SQLite has no datetime type; ISO-8601 text sorts and compares correctly
+        return {'postgresql': 'TIMESTAMP', 'sqlite': 'TEXT'}.get(DB_TYPE, 'DATETIME(6)')
+    return 'TEXT'
+
+def widen_schema(schema, chunk):
+    """Widen schema in place to hold this chunk's values; returns {column: previous kind} of changes"""
+    changed = {}
+    for col in chunk.columns:
+        # An all-missing column carries no type information
+        if chunk[col].isna().all():
+            continue
+        kind = widest_kind(schema[col], column_kind(chunk[col]))
+        if kind != schema[col]:
+            changed[col] = schema[col]
+            schema[col] = kind
+    return changed
+
+def widen_table_columns(cursor, table_name, schema, chunk):
+    """ALTER columns whose values in this chunk no longer fit the type inferred so far"""
+    changed = widen_schema(schema, chunk)
+    if DB_TYPE == 'sqlite':
+        # SQLite columns accept any value (type affinity only), so just the schema widens
+        return
+    for col, previous in changed.items():
+        sql_type = sql_type_for_kind(schema[col])
+        if sql_type != sql_type_for_kind(previous):
+            if DB_TYPE == 'postgresql':
+                cursor.execute(f"ALTER TABLE {table_name} ALTER COLUMN {quote_identifier(col)} TYPE {sql_type}")
+            else:
+                cursor.execute(f"ALTER TABLE {table_name} MODIFY {quote_identifier(col)} {sql_type}")
+
+def save_table_schema(cursor, table_name, schema):
+    """Record each column's logical kind inside the caller's transaction"""
+    columns_json = json.dumps(schema)
+    if DB_TYPE in ('postgresql', 'sqlite'):
+        cursor.execute(
+            f"INSERT INTO {DATASET_SCHEMAS_TABLE} (table_name, columns_json) VALUES (%s, %s) "
+            f"ON CONFLICT (table_name) DO UPDATE SET columns_json = EXCLUDED.columns_json",
+            (table_name, columns_json)
+        )
+    else:
+        cursor.execute(
+            f"INSERT INTO {DATASET_SCHEMAS_TABLE} (table_name, columns_json) VALUES (%s, %s) "
+            f"ON DUPLICATE KEY UPDATE columns_json = VALUES(columns_json)",
+            (table_name, columns_json)
+        )
+
+def get_table_schema(connection, table_name):
+    """Return the recorded {column: kind} schema of a dataset table, or None for older tables"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT columns_json FROM {DATASET_SCHEMAS_TABLE} WHERE table_name = %s", (table_name,))
+    row = cursor.fetchone()
+    cursor.close()
+    return json.loads(row[0]) if row else None
+
+# dtype of a loaded column of each kind without missing values (integers are downcast to
+# their range and text with few distinct values becomes a category, see compact_dtype())
+KIND_DTYPES = {
+    'bool': 'bool',
+    'float': 'float64',
+    'datetime': 'datetime64[us]',
+    'category': 'category',
+    'text': str(pd.Series(['']).dtype),
+}
+
+def compact_dataframe(df, schema=None):
+    """Restore logical dtypes and shrink a freshly loaded frame in place.
+
+    Integers are downcast to the smallest type holding their range, bools and datetimes
+    regain their dtypes, and text columns with few distinct values become categoricals.
+    Floats are left at float64 so no precision is lost.
+    """
+    for col in df.columns:
+        series = df[col]
+        compacted = compact_series(series, schema.get(col) if schema else column_kind(series))
+        if compacted is not series:
+            df[col] = compacted
+    return df
+
+def compact_series(series, kind):
+    """One column of compact_dataframe(): the series as read, converted for its storage kind"""
+    has_missing = series.isna().any()
+    if kind == 'bool' and not has_missing:
+        return series.astype(KIND_DTYPES['bool'])
+    elif kind in INTEGER_KINDS and not has_missing:
+        return pd.to_numeric(series, downcast='integer')
+    elif kind == 'datetime':
+        return pd.to_datetime(series).astype(KIND_DTYPES['datetime'])
+    elif kind == 'category' or (kind == 'text' and len(series) and
+                                series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(series)):
+        return series.astype(KIND_DTYPES['category'])
+    return series
+
+def compact_dtype(kind, rows, non_null, low=None, high=None, distinct=None):
+    """Name of the dtype compact_series() gives a whole column, from aggregates over it:
+    row and non-null counts, MIN/MAX for integers and COUNT(DISTINCT) for text"""
+    if not non_null and kind in NUMERIC_KINDS + ('bool',):
+        # An all-NULL column is read as objects and left alone
+        return 'object'
+    if non_null < rows and kind in INTEGER_KINDS + ('bool',):
+        # Left as read: NaN makes integers float (PostgreSQL booleans come back as objects)
+        return 'object' if kind == 'bool' and DB_TYPE == 'postgresql' else 'float64'
+    if kind in INTEGER_KINDS:
+        return str(pd.to_numeric(pd.Series([int(low), int(high)]), downcast='integer').dtype)
+    if kind == 'text' and distinct <= CATEGORY_MAX_UNIQUE_RATIO * rows:
+        return 'category'
+    return KIND_DTYPES[kind]
+
+def record_memory_savings(table_name, raw_bytes, compact_bytes):
+    """Remember how much compaction saved for a table (reported under /cache_stats)"""
+    with _memory_savings_lock:
+        dataset_memory_savings[table_name] = {
+            'raw_bytes': raw_bytes,
+            'compact_bytes': compact_bytes,
+            'saved_bytes': raw_bytes - compact_bytes,
+        }
+
+dataset_memory_savings = {}
+_memory_savings_lock = threading.Lock()
+
+_dataset_store = None
+
+def get_dataset_store():
+    """The columnar dataset store (DATASET_STORAGE 'arrow' or 'parquet'), created on first use"""
+    global _dataset_store
+    if _dataset_store is None:
+        from columnar_store import ColumnarStore
+        _dataset_store = ColumnarStore(DATASET_DIR, DATASET_STORAGE, CATEGORY_MAX_UNIQUE_RATIO,
+                                       DATASET_VERSION_RETENTION)
+    return _dataset_store
+
+def record_stored_dataset(table_name, owner, rows, nbytes):
+    """Register a dataset saved to the columnar store; if the database is down the sweeper adopts it later"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        register_dataset(cursor, table_name, owner, rows, nbytes)
+        cursor.close()
+        connection.commit()
+    except Error as e:
+        print(f"Error registering dataset: {e}")
+    finally:
+        if connection:
+            connection.close()
+
+def save_dataframe_chunks_to_store(chunks, table_name, progress=None, owner=None):
+    """save_dataframe_chunks_to_db() for the columnar store: one file per chunk, published at the end"""
+    try:
+        with get_dataset_store().writer(table_name) as writer:
+            schema = None
+            for chunk in chunks:
+                if schema is None:
+                    schema = {col: column_kind(chunk[col]) for col in chunk.columns}
+                else:
+                    chunk = chunk.reindex(columns=list(schema))
+                    widen_schema(schema, chunk)
+                with span('db_save') as info:
+                    writer.write(chunk, schema)
+                    info['rows'], info['bytes'] = len(chunk), int(chunk.memory_usage(deep=True).sum())
+                if progress:
+                    progress(writer.rows)
+            
+            if schema is None:
+                print(f"Error saving DataFrame to dataset store: no data for {table_name}")
+                return False
+            version = writer.commit(schema)
+        record_stored_dataset(table_name, owner, writer.rows, get_dataset_store().size(table_name, version))
+        return True
+    except (OSError, ValueError, TypeError) as e:
+        # pyarrow's errors derive from these
+        print(f"Error saving DataFrame to dataset store: {e}")
+        return False
+
+def save_dataframe_chunks_to_db(chunks, table_name, progress=None, owner=None):
+    """Stream DataFrame chunks into a new table in one transaction.
+
+    The schema is inferred from the first chunk; later chunks are aligned to its columns and
+    widen column types where needed, so only one chunk is ever held in memory. The dataset
+    is registered to the `owner` session.
+    """
+    if DATASET_STORAGE != 'sql':
+        return save_dataframe_chunks_to_store(chunks, table_name, progress, owner)
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return False
+        
+        ensure_metadata_tables(connection)
+        cursor = connection.cursor()
+        
+        schema = None
+        physical_name = None
+        rows = nbytes = 0
+        for chunk in chunks:
+            if schema is None:
+                # Load into a new physical table; the current one stays untouched and readable
+                physical_name = new_physical_table_name(table_name)
+                
+                # Create table dynamically based on the first chunk's columns
+                schema = {col: column_kind(chunk[col]) for col in chunk.columns}
+                # Handle column names with spaces or special characters
+                columns_sql = [f'{quote_identifier(col)} {sql_type_for_kind(kind)}' for col, kind in schema.items()]
+                cursor.execute(f"CREATE TABLE {physical_name} ({', '.join(columns_sql)})")
+            else:
+                chunk = chunk.reindex(columns=list(schema))
+                widen_table_columns(cursor, physical_name, schema, chunk)
+            
+            # Bulk load rows (COPY for PostgreSQL, batched executemany / LOAD DATA for MySQL)
+            with span('db_save') as info:
+                bulk_insert_dataframe(cursor, chunk, physical_name)
+                info['rows'], info['bytes'] = len(chunk), int(chunk.memory_usage(deep=True).sum())
+            rows += len(chunk)
+            nbytes += info['bytes']
+            if progress:
+                progress(rows)
+        
+        if schema is None:
+            print(f"Error saving DataFrame to database: no data for {table_name}")
+            return False
+        
+        # The swap: pointer, schema and version change together
+        publish_table(cursor, table_name, physical_name, schema)
+        register_dataset(cursor, table_name, owner, rows, nbytes)
+        
+        connection.commit()
+        cursor.close()
+        dataframe_cache.invalidate(table_name)
+        physical_name = None
+        collect_retired_tables(connection)
+        return True
+    except Error as e:
+        print(f"Error saving DataFrame to database: {e}")
+        if connection:
+            connection.rollback()
+            if physical_name is not None:
+                # MySQL commits CREATE TABLE implicitly, so the partial table may survive the rollback
+                drop_table_quietly(connection, physical_name)
+        return False
+    finally:
+        # Returns the connection to the pool (the pool rolls back anything left open)
+        if connection:
+            connection.close()
+
+def save_dataframe_to_db(df, table_name, owner=None):
+    """Save a pandas DataFrame to database (MySQL, PostgreSQL or SQLite)"""
+    return save_dataframe_chunks_to_db([df], table_name, owner=owner)
+
+def load_dataframe_from_db(table_name):
+    """Load a pandas DataFrame from database (MySQL, PostgreSQL or SQLite).
+
+    Served from the in-process cache while the table's committed version is unchanged;
+    the caller always gets its own copy and may modify it freely.
+    """
+    return load_versioned_dataframe(table_name)[0]
+
+def load_versioned_dataframe(table_name, columns=None):
+    """load_dataframe_from_db() that also returns the table version read, as (df, version).
+
+    With columns, only those columns are read (and the result is not cached).
+    """
+    if DATASET_STORAGE != 'sql':
+        return load_stored_dataframe(table_name, columns)
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None, None
+        
+        ensure_metadata_tables(connection)
+        version, physical_name = resolve_table(connection, table_name)
+        df = dataframe_cache.get(table_name, version)
+        if df is not None:
+            return (df if columns is None else df[[col for col in columns if col in df.columns]]), version
+        
+        schema = get_table_schema(connection, physical_name)
+        if columns is not None and schema is not None:
+            columns = [col for col in columns if col in schema]
+            schema = {col: schema[col] for col in columns}
+        with span('db_load') as info:
+            if columns is None or schema is None:
+                query = f"SELECT * FROM {physical_name}"
+            else:
+                query = f"SELECT {', '.join(quote_identifier(col) for col in columns)} FROM {physical_name}"
+            df = pd.read_sql(query, connection)
+            raw_bytes = int(df.memory_usage(deep=True).sum())
+            compact_dataframe(df, schema)
+            info['rows'], info['bytes'] = len(df), raw_bytes
+        if columns is not None:
+            return df[[col for col in columns if col in df.columns]], version
+        record_memory_savings(table_name, raw_bytes, int(df.memory_usage(deep=True).sum()))
+        if DATAFRAME_CACHE_BYTES > 0:
+            dataframe_cache.put(table_name, version, df)
+            df = df.copy()
+        return df, version
+    except Error as e:
+        print(f"Error loading DataFrame from database: {e}")
+        return None, None
+    finally:
+        if connection:
+            connection.close()
+
+def load_stored_dataframe(table_name, columns=None):
+    """load_versioned_dataframe() for the columnar store.
+
+    The files are memory-mapped and only the requested columns are converted. Numeric
+    columns without missing values are read-only views of the mapping, so callers replace
+    columns rather than assigning into them. Frames are not kept in the DataFrame cache:
+    the mapped pages live in the OS page cache, shared by every worker.
+    """
+    try:
+        with span('db_load') as info:
+            table, manifest = get_dataset_store().read(table_name, columns)
+            if table is None:
+                print(f"Error loading DataFrame from dataset store: no dataset {table_name}")
+                return None, None
+            df = table.to_pandas(split_blocks=True)
+            info['rows'], info['bytes'] = len(df), table.nbytes
+        return df, manifest['version']
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Error loading DataFrame from dataset store: {e}")
+        return None, None
+
+def iter_table_chunks(table_name, chunk_rows=None):
+    """Stream a dataset table as DataFrame chunks through a server-side cursor.
+
+    PostgreSQL uses a named cursor and MySQL an unbuffered one, so only chunk_rows rows
+    are held in memory at a time. The connection stays checked out until the generator
+    is exhausted or closed. The columnar store yields slices of its memory-mapped files.
+    """
+    chunk_rows = chunk_rows or INCREMENTAL_CHUNK_ROWS
+    if DATASET_STORAGE != 'sql':
+        for batch in get_dataset_store().iter_batches(table_name, chunk_rows):
+            with span('db_stream') as info:
+                chunk = batch.to_pandas(split_blocks=True)
+                info['rows'] = len(chunk)
+            yield chunk
+        return
+    connection = get_db_connection()
+    if connection is None:
+        raise Error('Could not connect to the database')
+    try:
+        ensure_metadata_tables(connection)
+        _, physical_name = resolve_table(connection, table_name)
+        schema = get_table_schema(connection, physical_name)
+        if DB_TYPE == 'postgresql':
+            cursor = connection.cursor(name=f'stream_{uuid.uuid4().hex}')
+            cursor.itersize = chunk_rows
+        elif DB_TYPE == 'sqlite':
+            # sqlite3 cursors already step through the result as rows are fetched
+            cursor = connection.cursor()
+        else:
+            cursor = connection.cursor(buffered=False)
+        cursor.execute(f"SELECT * FROM {physical_name}")
+        while True:
+            with span('db_stream') as info:
+                rows = cursor.fetchmany(chunk_rows)
+                if rows:
+                    columns = [desc[0] for desc in cursor.description]
+                    chunk = compact_dataframe(pd.DataFrame.from_records(rows, columns=columns), schema)
+                    info['rows'] = len(chunk)
+            if not rows:
+                break
+            # Timed outside the span: the consumer's work between chunks is not streaming
+            yield chunk
+        cursor.close()
+    finally:
+        connection.close()
+
+def count_table_rows(table_name):
+    """Number of rows in a dataset table"""
+    if DATASET_STORAGE != 'sql':
+        manifest = get_dataset_store().manifest(table_name)
+        if manifest is None:
+            raise FileNotFoundError(f'No stored dataset named {table_name}')
+        return manifest['rows']
+    connection = get_db_connection()
+    if connection is None:
+        raise Error('Could not connect to the database')
+    try:
+        ensure_metadata_tables(connection)
+        _, physical_name = resolve_table(connection, table_name)
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {physical_name}")
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return int(count)
+    finally:
+        connection.close()
+
+def get_dataset_columns(table_name):
+    """Column names of a dataset table from its recorded schema, or None if unknown"""
+    if DATASET_STORAGE != 'sql':
+        manifest = get_dataset_store().manifest(table_name)
+        return list(manifest['schema']) if manifest else None
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None
+        ensure_metadata_tables(connection)
+        _, physical_name = resolve_table(connection, table_name)
+        schema = get_table_schema(connection, physical_name)
+        return list(schema) if schema else None
+    except Error as e:
+        print(f"Error reading table schema: {e}")
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+def value_counts_dict(counts):
+    """A value_counts() Series as a JSON-ready {value: count} dict (timestamps as pandas prints them)"""
+    return {str(value) if isinstance(value, pd.Timestamp) else value: int(count)
+            for value, count in counts.to_dict().items()}
+
+def value_counts_dataframe(df, columns, limit=None):
+    """Value counts per column computed in pandas"""
+    limit = limit or VALUE_COUNTS_LIMIT
+    return {col: value_counts_dict(df[col].value_counts().head(limit)) for col in columns if col in df.columns}
+
+def summarize_dataframe(df):
+    """Columns, preview, info text, dtypes and describe table computed in pandas"""
+    # Prepare data info
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    return {
+        'columns': list(df.columns),
+        'head_html': df.head(PREVIEW_ROWS).to_html(classes='table table-striped', index=False),
+        'info': buffer.getvalue(),
+        'dtypes': df.dtypes.to_dict(),
+        'describe_html': df.describe().to_html(classes='table table-striped'),
+    }
+
+def pushdown_value_counts(connection, table_name, schema, columns, limit=None):
+    """Value counts per column via GROUP BY ... ORDER BY count DESC LIMIT k.
+
+    The values are converted the way the pandas path loads them (compact_series() on what
+    read_sql returns), so a bool column counts True/False rather than the database's 0/1.
+    """
+    limit = limit or VALUE_COUNTS_LIMIT
+    results = {}
+    cursor = connection.cursor()
+    for col in columns:
+        if col not in schema:
+            continue
+        quoted = quote_identifier(col)
+        # The NULL group sorts first when there is one: missing values change how a column loads
+        cursor.execute(
+            f"SELECT {quoted}, COUNT(*) AS n FROM {table_name} "
+            f"GROUP BY {quoted} ORDER BY ({quoted} IS NULL) DESC, n DESC LIMIT %s",
+            (limit + 1,)
+        )
+        rows = cursor.fetchall()
+        has_missing = bool(rows) and rows[0][0] is None
+        rows = rows[1:] if has_missing else rows[:limit]
+        values = pd.Series([value for value, _ in rows] + ([None] if has_missing else []))
+        values = compact_series(values, schema[col])[:len(rows)]
+        results[col] = value_counts_dict(pd.Series([count for _, count in rows], index=values))
+    cursor.close()
+    return results
+
+def numeric_value_sql(col):
+    """SQL expression reading a numeric column as floating point"""
+    if DB_TYPE == 'postgresql':
+        return f"CAST({quote_identifier(col)} AS DOUBLE PRECISION)"
+    # MySQL makes this DECIMAL (no BIGINT overflow in SUM(x * x)), SQLite makes it REAL
+    return f"({quote_identifier(col)} * 1.0)"
+
+def pushdown_quantiles(cursor, table_name, col, count, quantiles=(0.25, 0.5, 0.75)):
+    """Linearly interpolated quantiles of a column's `count` non-null values (as pandas computes them).
+
+    PostgreSQL uses percentile_cont. Elsewhere ROW_NUMBER() returns only the rows at the
+    ranks the quantiles fall between (window functions: MySQL 8, SQLite 3.25+).
+    """
+    if not count:
+        return [None] * len(quantiles)
+    value = numeric_value_sql(col)
+    if DB_TYPE == 'postgresql':
+        cursor.execute(
+            f"SELECT {', '.join(f'PERCENTILE_CONT({q}) WITHIN GROUP (ORDER BY {value})' for q in quantiles)} "
+            f"FROM {table_name}"
+        )
+        return [float(v) for v in cursor.fetchone()]
+    positions = [q * (count - 1) for q in quantiles]
+    ranks = sorted({int(p) + 1 for p in positions} | {min(int(p) + 2, count) for p in positions})
+    cursor.execute(
+        f"SELECT rn, v FROM (SELECT {value} AS v, ROW_NUMBER() OVER (ORDER BY {value}) AS rn "
+        f"FROM {table_name} WHERE {quote_identifier(col)} IS NOT NULL) ranked "
+        f"WHERE rn IN ({', '.join(['%s'] * len(ranks))})",
+        ranks
+    )
+    values = {int(rn): float(v) for rn, v in cursor.fetchall()}
+    result = []
+    for p in positions:
+        below, above = values[int(p) + 1], values[min(int(p) + 2, count)]
+        result.append(below + (above - below) * (p - int(p)))
+    return result
+
+def pushdown_describe(connection, table_name, schema):
+    """describe() of the numeric columns computed by the database.
+
+    Count, mean, std, min and max of every column come from one aggregate query and the
+    quartiles from pushdown_quantiles(), so only the 8 x N summary leaves the database.
+    SQLite has no STDDEV_SAMP, so there a second pass sums squared deviations from each
+    mean (SUM(x * x) - n * mean * mean cancels out for values far from zero).
+    """
+    numeric = [col for col, kind in schema.items() if kind in NUMERIC_KINDS]
+    index = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+    if not numeric:
+        return pd.DataFrame(index=index)
+    
+    aggregates = []
+    for col in numeric:
+        value = numeric_value_sql(col)
+        spread = 'NULL' if DB_TYPE == 'sqlite' else f"STDDEV_SAMP({value})"
+        aggregates += [f"COUNT({value})", f"AVG({value})", spread, f"MIN({value})", f"MAX({value})"]
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT {', '.join(aggregates)} FROM {table_name}")
+    row = [np.nan if value is None else float(value) for value in cursor.fetchone()]
+    columns = [row[5 * i:5 * i + 5] for i in range(len(numeric))]
+    
+    if DB_TYPE == 'sqlite':
+        deviations, means = [], []
+        for col, (_, mean, _, _, _) in zip(numeric, columns):
+            value = numeric_value_sql(col)
+            deviations.append(f"SUM(({value} - %s) * ({value} - %s))")
+            means += [0.0 if np.isnan(mean) else mean] * 2
+        cursor.execute(f"SELECT {', '.join(deviations)} FROM {table_name}", means)
+        for stats, squares in zip(columns, cursor.fetchone()):
+            count = stats[0]
+            stats[2] = np.sqrt(float(squares) / (count - 1)) if count > 1 else np.nan
+    
+    stats = []
+    for col, (count, mean, std, low, high) in zip(numeric, columns):
+        quartiles = [np.nan if q is None else q for q in pushdown_quantiles(cursor, table_name, col, int(count))]
+        stats.append([count, mean, std, low, *quartiles, high])
+    cursor.close()
+    return pd.DataFrame(np.array(stats, dtype=float).T, index=index, columns=numeric)
+
+def pushdown_summary(connection, table_name, schema):
+    """Everything summarize_dataframe() returns, computed with a few aggregate queries"""
+    columns = list(schema)
+    # Per column: the non-null count, plus what compact_dtype() needs for its kind
+    aggregates = ['COUNT(*)']
+    for col in columns:
+        quoted = quote_identifier(col)
+        aggregates.append(f"COUNT({quoted})")
+        if schema[col] in INTEGER_KINDS:
+            aggregates += [f"MIN({quoted})", f"MAX({quoted})"]
+        elif schema[col] == 'text':
+            aggregates.append(f"COUNT(DISTINCT {quoted})")
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT {', '.join(aggregates)} FROM {table_name}")
+    values = list(cursor.fetchone())
+    cursor.close()
+    n_rows, position = values[0], 1
+    non_null, dtypes = {}, {}
+    for col in columns:
+        kind = schema[col]
+        non_null[col] = values[position]
+        extra = 2 if kind in INTEGER_KINDS else 1 if kind == 'text' else 0
+        stats = values[position + 1:position + 1 + extra]
+        position += 1 + extra
+        if kind in INTEGER_KINDS:
+            dtypes[col] = compact_dtype(kind, n_rows, non_null[col], low=stats[0], high=stats[1])
+        else:
+            dtypes[col] = compact_dtype(kind, n_rows, non_null[col], distinct=stats[0] if stats else None)
+    
+    head = pd.read_sql(f"SELECT * FROM {table_name} LIMIT {PREVIEW_ROWS}", connection)
+    compact_dataframe(head, schema)
+    
+    lines = [f"{n_rows} entries (computed in the database)",
+             f"Data columns (total {len(columns)} columns):",
+             f" #   {'Column':<24} {'Non-Null Count':<16} Dtype"]
+    for i, col in enumerate(columns):
+        lines.append(f" {i:<3} {str(col):<24} {f'{non_null[col]} non-null':<16} {dtypes[col]}")
+    return {
+        'columns': columns,
+        'head_html': head.to_html(classes='table table-striped', index=False),
+        'info': '\n'.join(lines) + '\n',
+        'dtypes': dtypes,
+        'describe_html': pushdown_describe(connection, table_name, schema).to_html(classes='table table-striped'),
+    }
+
+def run_aggregate(table_name, pushdown, fallback, steps=(), columns=None):
+    """Run pushdown(connection, table_name, schema) in the database, or fallback(df) in pandas.
+
+    pandas is used when pushdown is disabled, preprocessing steps are recorded (the table
+    holds raw data), the table has no recorded schema, the table is already cached in this
+    worker, datasets are in the columnar store, or the aggregate query fails. Without steps
+    the fallback only loads `columns` (all columns if None).
+    """
+    if AGGREGATE_PUSHDOWN and not steps and DATASET_STORAGE == 'sql':
+        connection = None
+        try:
+            connection = get_db_connection()
+            if connection is not None:
+                ensure_metadata_tables(connection)
+                version, physical_name = resolve_table(connection, table_name)
+                schema = get_table_schema(connection, physical_name)
+                if schema is not None and not dataframe_cache.contains(table_name, version):
+                    with span('db_aggregate'):
+                        return pushdown(connection, physical_name, schema)
+        except Error as e:
+            print(f"Aggregate pushdown failed, falling back to pandas: {e}")
+        finally:
+            if connection:
+                connection.close()
+    
+    df = load_processed_dataframe(table_name, steps, columns)
+    if df is None:
+        return None
+    return fallback(df)
+
+# Preprocessing pipeline: the dataset table keeps the uploaded data, each session records
+# its preprocessing steps, and the steps are replayed on the cached raw frame when data
+# is needed (prefixes are cached too), so no step rewrites the table
+
+# Step operations: each names a preprocessors transformer built from the step's params
+PIPELINE_STEPS = {
+    'handle_missing': 'MissingValueFiller',
+    'handle_outliers': 'OutlierClipper',
+    'encode_data': 'CategoryEncoder',
+    'scale_data': 'ColumnScaler',
+}
+
+# Session keys derived from the steps' info (what /predict needs to know about preprocessing)
+PIPELINE_SESSION_KEYS = ('encoders', 'scaler_type', 'scaler_columns')
+
+def make_transformer(step):
+    """Unfitted transformer for a recorded step"""
+    import preprocessors
+    return getattr(preprocessors, PIPELINE_STEPS[step['op']])(**step['params'])
+
+def fitted_info(transformer):
+    """Session keys describing what a fitted step learned"""
+    from preprocessors import CategoryEncoder, ColumnScaler
+    if isinstance(transformer, CategoryEncoder):
+        return {'encoders': transformer.classes_}
+    if isinstance(transformer, ColumnScaler):
+        return {'scaler_type': transformer.method, 'scaler_columns': list(transformer.columns)}
+    return {}
+
+def pipeline_cache_key(table_name, steps):
+    """Cache key of a table with steps applied; the raw table keeps its own name"""
+    if not steps:
+        return table_name
+    spec = json.dumps([[step['op'], step['params']] for step in steps], sort_keys=True)
+    return f"{table_name}@{hashlib.sha256(spec.encode()).hexdigest()[:16]}"
+
+def cache_processed(table_name, steps, version, df):
+    """Keep a processed frame for reuse; returns a copy the caller may modify"""
+    if DATAFRAME_CACHE_BYTES <= 0 or version is None:
+        return df
+    dataframe_cache.put(pipeline_cache_key(table_name, steps), version, df)
+    return df.copy()
+
+def replay_pipeline(table_name, steps, columns=None):
+    """Apply recorded steps to the raw table, starting from the longest cached prefix.
+
+    Returns (df, version of the raw table), or (None, None) if loading fails. With no
+    steps to replay, `columns` limits the load to those columns.
+    """
+    steps = list(steps or [])
+    if columns is not None and not steps:
+        return load_versioned_dataframe(table_name, columns)
+    df, start = None, 0
+    version = get_dataset_version(table_name) if steps else None
+    if version is not None:
+        for n in range(len(steps), 0, -1):
+            key = pipeline_cache_key(table_name, steps[:n])
+            if dataframe_cache.contains(key, version):
+                df, start = dataframe_cache.get(key, version), n
+                break
+    if df is None:
+        df, version = load_versioned_dataframe(table_name)
+        if df is None:
+            return None, None
+    
+    for step in steps[start:]:
+        with span('transform') as info:
+            info['rows'] = len(df)
+            df = make_transformer(step).fit_apply(df)
+    if start < len(steps):
+        df = cache_processed(table_name, steps, version, df)
+    return df, version
+
+def fit_pipeline(table_name, steps):
+    """Replay every step from the raw table, keeping the fitted transformers.
+
+    Returns (df, [(name, transformer), ...]) ready for an sklearn Pipeline, or (None, None).
+    """
+    df = load_dataframe_from_db(table_name)
+    if df is None:
+        return None, None
+    transformers = []
+    for i, step in enumerate(steps or []):
+        transformer = make_transformer(step)
+        with span('transform') as info:
+            info['rows'] = len(df)
+            df = transformer.fit_apply(df)
+        transformers.append((f"{i}_{step['op']}", transformer))
+    return df, transformers
+
+def row_test_mask(chunk, test_size, random_state):
+    """Deterministic train/test assignment per row from a hash of its values.
+
+    Numeric columns are hashed as floats and the rest as text, so a row lands on the same
+    side on every pass regardless of which chunk it arrives in or the dtypes that chunk got.
+    """
+    from preprocessors import is_numeric_column
+    values = pd.DataFrame({col: chunk[col].astype(float) if is_numeric_column(chunk[col]) else chunk[col].astype(str)
+                           for col in chunk.columns}, index=chunk.index)
+    hashes = pd.util.hash_pandas_object(values, index=False, hash_key=f'{random_state:016d}'[-16:])
+    return pd.Series(hashes.to_numpy() % 10000 < test_size * 10000, index=chunk.index)
+
+def iter_training_chunks(table_name, transformers, test_size=0.0, random_state=0):
+    """Stream the table through fitted steps; yields (chunk, boolean test-row mask)"""
+    for chunk in iter_table_chunks(table_name):
+        is_test = row_test_mask(chunk, test_size, random_state)
+        for _, transformer in transformers:
+            chunk = transformer.transform_training(chunk)
+        yield chunk, is_test.loc[chunk.index].to_numpy()
+
+def fit_pipeline_incremental(table_name, steps):
+    """fit_pipeline() without loading the table.
+
+    Each step is fit on one streamed pass over the output of the steps before it: with
+    partial_fit where its statistics accumulate exactly, otherwise on a random sample of
+    about INCREMENTAL_SAMPLE_ROWS rows. Returns [(name, transformer), ...].
+    """
+    transformers = []
+    n_rows = None
+    for i, step in enumerate(steps or []):
+        transformer = make_transformer(step)
+        chunks = (chunk for chunk, _ in iter_training_chunks(table_name, transformers))
+        if transformer.can_partial_fit():
+            for chunk in chunks:
+                transformer.partial_fit(chunk)
+        else:
+            if n_rows is None:
+                n_rows = count_table_rows(table_name)
+            fraction = min(1.0, INCREMENTAL_SAMPLE_ROWS / max(n_rows, 1))
+            transformer.fit(pd.concat([chunk.sample(frac=fraction, random_state=i) for chunk in chunks]))
+        transformers.append((f"{i}_{step['op']}", transformer))
+    return transformers
+
+def load_processed_dataframe(table_name, steps, columns=None):
+    """The dataset as the session's preprocessing steps leave it, or None"""
+    return replay_pipeline(table_name, steps, columns)[0]
+
+def pipeline_session(steps, redo=()):
+    """Session updates for a pipeline: its steps, the redo stack and the steps' info"""
+    updates = {key: None for key in PIPELINE_SESSION_KEYS}
+    for step in steps:
+        updates.update(step['info'])
+    updates.update({'pipeline': list(steps), 'pipeline_redo': list(redo)})
+    return updates
+
+def extend_pipeline(table_name, version, steps, df, op, params, message, cache=True):
+    """Apply a new step to df (the replayed steps' output) and record it.
+
+    Returns (processed df, new step); df itself is left untouched. Pass cache=False
+    when df holds only some of the columns, so the partial result is not cached.
+    """
+    transformer = make_transformer({'op': op, 'params': params})
+    with span('transform') as info:
+        info['rows'] = len(df)
+        processed = transformer.fit_apply(df)
+    step = {'op': op, 'params': params, 'info': fitted_info(transformer), 'message': message}
+    if cache:
+        processed = cache_processed(table_name, list(steps) + [step], version, processed)
+    return processed, step
+
+def pipeline_step_result(table_name, steps, step):
+    """A task's new step, tagged with the pipeline it was fitted on"""
+    return {'table_name': table_name, 'base': pipeline_cache_key(table_name, steps), 'step': step}
+
+def apply_task_session(result):
+    """Apply a finished task's session changes.
+
+    A new pipeline step is appended to the session's current pipeline, but only if that is
+    still the pipeline the step was fitted on; otherwise nothing is applied and an error
+    message is returned.
+    """
+    added = result.get('pipeline_step')
+    if added is not None:
+        table_name = session.get('table_name')
+        steps = session.get('pipeline', [])
+        if table_name != added['table_name'] or pipeline_cache_key(table_name, steps) != added['base']:
+            return 'The preprocessing steps changed while this job ran, so its step was not added. Please run it again.'
+        session.update(pipeline_session(list(steps) + [added['step']]))
+    session.update(result.get('session', {}))
+    return None
+
+def add_pipeline_step(op, params, message):
+    """Record a step for the session's dataset inline and return the JSON response"""
+    table_name = session['table_name']
+    steps = session.get('pipeline', [])
+    df, version = replay_pipeline(table_name, steps)
+    if df is None:
+        return jsonify({'success': False, 'message': 'Error loading data'})
+    _, step = extend_pipeline(table_name, version, steps, df, op, params, message)
+    session.update(pipeline_session(list(steps) + [step]))
+    return jsonify({'success': True, 'message': message})
+
+def get_session_id():
+    """Return a stable random id for the current browser session, assigning one if needed"""
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
+    return session['session_id']
+
+_local_dbs_ready = set()
+
+def open_local_db(path, schema_sql):
+    """Open a connection to a host-local SQLite state file, creating its table once per process"""
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    if path not in _local_dbs_ready:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(schema_sql)
+        connection.commit()
+        _local_dbs_ready.add(path)
+    return connection
+
+def jobs_db():
+    """Open a connection to the local job store"""
+    return open_local_db(
+        JOBS_DB_PATH,
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT NOT NULL, "
+        "state TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT, "
+        "result TEXT, error TEXT, applied INTEGER NOT NULL DEFAULT 0, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+
+def sessions_db():
+    """Open a connection to the local server-side session store"""
+    return open_local_db(
+        SESSION_DB_PATH,
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+    )
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict whose contents live in the session store; the cookie holds only its id"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=0.0):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+class SqliteSessionInterface(SessionInterface):
+    """Flask session backend keeping session data in a local SQLite file.
+
+    Rows expire after PERMANENT_SESSION_LIFETIME. Unmodified sessions are only re-written
+    once half their lifetime has passed, and expired rows are purged every
+    SESSION_CLEANUP_INTERVAL seconds.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self):
+        self._last_cleanup = 0.0
+
+    def _lifetime(self, app):
+        return app.config['PERMANENT_SESSION_LIFETIME'].total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            with closing(sessions_db()) as connection:
+                row = connection.execute(
+                    "SELECT data, expires_at FROM sessions WHERE sid = ?", (sid,)
+                ).fetchone()
+            if row is not None and row['expires_at'] > time.time():
+                return ServerSideSession(self.serializer.loads(row['data']), sid=sid,
+                                         expires_at=row['expires_at'])
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        
+        if not session:
+            if session.modified:
+                with closing(sessions_db()) as connection, connection:
+                    connection.execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        
+        now = time.time()
+        lifetime = self._lifetime(app)
+        stale = session.expires_at - now < lifetime / 2
+        if session.modified or stale:
+            with closing(sessions_db()) as connection, connection:
+                connection.execute(
+                    "INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                    (session.sid, self.serializer.dumps(dict(session)), now + lifetime)
+                )
+                if now - self._last_cleanup > SESSION_CLEANUP_INTERVAL:
+                    connection.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+                    self._last_cleanup = now
+        
+        if session.new or stale or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+if SESSION_BACKEND == 'sqlite':
+    app.session_interface = SqliteSessionInterface()
+
+def plots_db():
+    """Open a connection to the local rendered-plot store"""
+    return open_local_db(
+        PLOTS_DB_PATH,
+        "CREATE TABLE IF NOT EXISTS plots ("
+        "plot_id TEXT PRIMARY KEY, table_name TEXT NOT NULL, mimetype TEXT NOT NULL, "
+        "image BLOB NOT NULL, size INTEGER NOT NULL, render_seconds REAL NOT NULL, "
+        "last_used REAL NOT NULL)"
+    )
+
+plot_stats = {'hits': 0, 'misses': 0, 'render_seconds_total': 0.0}
+_plot_stats_lock = threading.Lock()
+
+def plot_id_for(table_name, version, columns, plot_type, fmt):
+    """Stable id of a rendered plot; the same inputs always render the same image, so it doubles as the ETag"""
+    key = json.dumps([table_name, version, list(columns), plot_type, fmt])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def get_dataset_version(table_name):
+    """Committed version of a dataset table, or None if the database is unavailable"""
+    if DATASET_STORAGE != 'sql':
+        return get_dataset_store().version(table_name)
+    connection = None
+    try:
+        connection = get_db_connection()
+        if connection is None:
+            return None
+        ensure_metadata_tables(connection)
+        return get_table_version(connection, table_name)
+    except Error as e:
+        print(f"Error reading table version: {e}")
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+def get_cached_plot(plot_id):
+    """Return the stored plot row (marking it recently used), or None"""
+    with closing(plots_db()) as connection:
+        row = connection.execute("SELECT * FROM plots WHERE plot_id = ?", (plot_id,)).fetchone()
+        if row is not None:
+            connection.execute("UPDATE plots SET last_used = ? WHERE plot_id = ?", (time.time(), plot_id))
+            connection.commit()
+        return row
+
+def store_plot(plot_id, table_name, mimetype, image, render_seconds):
+    """Save a rendered plot, then evict least recently used plots beyond PLOT_CACHE_BYTES"""
+    with closing(plots_db()) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO plots (plot_id, table_name, mimetype, image, size, render_seconds, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (plot_id, table_name, mimetype, image, len(image), render_seconds, time.time())
+        )
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM plots").fetchone()[0]
+        if total > PLOT_CACHE_BYTES:
+            rows = connection.execute("SELECT plot_id, size FROM plots WHERE plot_id != ? ORDER BY last_used", (plot_id,))
+            evict = []
+            for row in rows:
+                if total <= PLOT_CACHE_BYTES:
+                    break
+                evict.append((row['plot_id'],))
+                total -= row['size']
+            connection.executemany("DELETE FROM plots WHERE plot_id = ?", evict)
+        connection.commit()
+
+def render_plot(plot_id, table_name, fmt, draw):
+    """Serve a plot from the store, or call draw() for a figure, rasterize it and store it.
+
+    Returns the JSON fields the client needs: the image URL, the figure's render time and
+    whether it came from the cache.
+    """
+    row = get_cached_plot(plot_id)
+    if row is not None:
+        with _plot_stats_lock:
+            plot_stats['hits'] += 1
+        return {'image_url': f'/plots/{plot_id}', 'render_seconds': row['render_seconds'], 'cached': True}
+    
+    start = time.perf_counter()
+    fig = draw()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    render_seconds = time.perf_counter() - start
+    image = buffer.getvalue()
+    record_span('plot_render', render_seconds, nbytes=len(image))
+    store_plot(plot_id, table_name, PLOT_FORMATS[fmt], image, render_seconds)
+    with _plot_stats_lock:
+        plot_stats['misses'] += 1
+        plot_stats['render_seconds_total'] += render_seconds
+    return {'image_url': f'/plots/{plot_id}', 'render_seconds': render_seconds, 'cached': False}
+
+def plot_cache_stats():
+    """Store totals plus this worker's hit/miss counters"""
+    with closing(plots_db()) as connection:
+        entries, total_bytes, avg_render = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), AVG(render_seconds) FROM plots"
+        ).fetchone()
+    with _plot_stats_lock:
+        stats = dict(plot_stats)
+    stats.update({'entries': entries, 'total_bytes': total_bytes, 'max_bytes': PLOT_CACHE_BYTES,
+                  'render_seconds_avg': avg_render or 0.0})
+    return stats
+
+def box_stats_entry(label, q1, med, q3, whislo, whishi, fliers):
+    """One Axes.bxp statistics dict"""
+    return {'label': label, 'q1': q1, 'med': med, 'q3': q3, 'whislo': whislo, 'whishi': whishi,
+            'fliers': np.asarray(fliers, dtype=float)}
+
+def thin_fliers(fliers, max_fliers):
+    """Evenly spaced sample of sorted outliers (keeps both extremes)"""
+    if len(fliers) > max_fliers:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype(int)]
+    return fliers
+
+def boxplot_stats(df, columns, max_fliers=None):
+    """Quartiles, 1.5 IQR whiskers and a capped flier sample per numeric column, for Axes.bxp.
+
+    Quartiles for all columns come from one percentile call over a float matrix, and only
+    the outliers (at most max_fliers per column) are handed to matplotlib.
+    """
+    from preprocessors import is_numeric_column
+    max_fliers = BOXPLOT_MAX_FLIERS if max_fliers is None else max_fliers
+    numeric = [col for col in columns if col in df.columns and is_numeric_column(df[col])]
+    if not numeric:
+        return []
+    values = df[numeric].to_numpy(dtype=float, na_value=np.nan)
+    has_nan = np.isnan(values).any(axis=0)
+    percentile = np.nanpercentile if has_nan.any() else np.percentile
+    q1, med, q3 = percentile(values, [25, 50, 75], axis=0)
+    lower = q1 - 1.5 * (q3 - q1)
+    upper = q3 + 1.5 * (q3 - q1)
+    
+    stats = []
+    for i, col in enumerate(numeric):
+        column = values[:, i]
+        if has_nan[i]:
+            column = column[~np.isnan(column)]
+        outside = (column < lower[i]) | (column > upper[i])
+        fliers = np.sort(column[outside])
+        inside = column[~outside] if len(fliers) else column
+        stats.append(box_stats_entry(
+            col, q1[i], med[i], q3[i],
+            inside.min() if len(inside) else q1[i], inside.max() if len(inside) else q3[i],
+            thin_fliers(fliers, max_fliers)
+        ))
+    return stats
+
+def pushdown_boxplot_stats(connection, table_name, schema, columns, max_fliers=None):
+    """boxplot_stats() computed by the database, so drawing never loads the table.
 
-if USE_POSTGRESQL:
-    # Production: PostgreSQL (Render)
-    import psycopg2
-    from psycopg2 import Error
-    print("🐘 Using PostgreSQL (Render)")
-else:
-    # Local: MySQL
-    import mysql.connector
-    from mysql.connector import Error
-    print("🐬 Using MySQL (Local)")
+    Per column: quartiles from pushdown_quantiles(), whiskers and the outlier count from one
+    conditional aggregate, and at most max_fliers outliers. When there are more, ROW_NUMBER()
+    picks the same evenly spaced ranks thin_fliers() would keep.
+    """
+    max_fliers = BOXPLOT_MAX_FLIERS if max_fliers is None else max_fliers
+    numeric = [col for col in columns if schema.get(col) in NUMERIC_KINDS]
+    stats = []
+    cursor = connection.cursor()
+    for col in numeric:
+        value = numeric_value_sql(col)
+        cursor.execute(f"SELECT COUNT({value}) FROM {table_name}")
+        count = int(cursor.fetchone()[0])
+        if not count:
+            continue
+        q1, med, q3 = pushdown_quantiles(cursor, table_name, col, count)
+        lower, upper = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        outside = f"({value} < %s OR {value} > %s)"
+        cursor.execute(
+            f"SELECT MIN(CASE WHEN NOT {outside} THEN {value} END), MAX(CASE WHEN NOT {outside} THEN {value} END), "
+            f"COUNT(CASE WHEN {outside} THEN 1 END) FROM {table_name}",
+            (lower, upper) * 3
+        )
+        whislo, whishi, n_fliers = cursor.fetchone()
+        n_fliers = int(n_fliers)
+        if n_fliers <= max_fliers:
+            cursor.execute(f"SELECT {value} AS v FROM {table_name} WHERE {outside} ORDER BY v", (lower, upper))
+        else:
+            ranks = sorted({int(i) + 1 for i in np.linspace(0, n_fliers - 1, max_fliers)})
+            cursor.execute(
+                f"SELECT v FROM (SELECT {value} AS v, ROW_NUMBER() OVER (ORDER BY {value}) AS rn "
+                f"FROM {table_name} WHERE {outside}) ranked "
+                f"WHERE rn IN ({', '.join(['%s'] * len(ranks))}) ORDER BY v",
+                (lower, upper, *ranks)
+            )
+        fliers = [float(row[0]) for row in cursor.fetchall()]
+        stats.append(box_stats_entry(
+            col, q1, med, q3,
+            q1 if whislo is None else float(whislo), q3 if whishi is None else float(whishi), fliers
+        ))
+    cursor.close()
+    return stats
 
-app = Flask(__name__)
+def draw_boxplot(ax, stats, title):
+    """Draw boxplots from precomputed statistics"""
+    if stats:
+        ax.bxp(stats)
+    ax.grid(True)
+    ax.set_title(title)
+    ax.set_xlabel('Columns')
+    ax.set_ylabel('Values')
+    ax.tick_params(axis='x', rotation=45)
 
-# Production-ready configuration using environment variables
-app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=int(os.getenv('SESSION_LIFETIME_HOURS', 2)))
-app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))
+def draw_outlier_boxplot(stats):
+    """Figure with one boxplot per column"""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    draw_boxplot(ax, stats, 'Outlier Detection - Before Handling')
+    fig.tight_layout()
+    return fig
 
-# Database Configuration
-# Automatically detects if running on Render (PostgreSQL) or Local (MySQL)
-if USE_POSTGRESQL:
-    # Render PostgreSQL - uses DATABASE_URL
-    DB_CONFIG = DATABASE_URL
-    DB_TYPE = 'postgresql'
-else:
-    # Local MySQL - uses individual parameters from .env
-    DB_CONFIG = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'port': int(os.getenv('DB_PORT', 3306)),
-        'user': os.getenv('DB_USER', 'root'),
-        'password': os.getenv('DB_PASSWORD', 'password'),
-        'database': os.getenv('DB_NAME', 'ml_webapp_db')
-    }
-    DB_TYPE = 'mysql'
+def draw_outlier_comparison(before, after, columns):
+    """Figure with before/after boxplots side by side"""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    draw_boxplot(ax1, boxplot_stats(before, columns), 'Before Handling Outliers')
+    draw_boxplot(ax2, boxplot_stats(after, columns), 'After Handling Outliers')
+    fig.tight_layout()
+    return fig
 
-# Allowed file extensions
-ALLOWED_EXTENSIONS = {'csv', 'json', 'xml'}
+def create_job(kind, owner):
+    """Record a new queued job and return its id"""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with closing(jobs_db()) as connection, connection:
+        connection.execute(
+            "INSERT INTO jobs (job_id, kind, owner, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, owner, now, now)
+        )
+    return job_id
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def update_job(job_id, **fields):
+    """Update columns of a job row (state, progress, message, result, error, applied)"""
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    with closing(jobs_db()) as connection, connection:
+        connection.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
 
-def get_db_connection():
-    """Create and return a database connection (works for both MySQL and PostgreSQL)"""
+def claim_job_result(job_id):
+    """Mark a finished job's session changes as applied; False if another poll already did"""
+    with closing(jobs_db()) as connection, connection:
+        cursor = connection.execute(
+            "UPDATE jobs SET applied = 1, updated_at = ? WHERE job_id = ? AND applied = 0", (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+def get_job(job_id):
+    """Return a job row as a dict, or None"""
+    with closing(jobs_db()) as connection:
+        row = connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def purge_expired_jobs():
+    """Forget jobs untouched for longer than a session can live"""
+    cutoff = time.time() - app.config['PERMANENT_SESSION_LIFETIME'].total_seconds()
+    with closing(jobs_db()) as connection, connection:
+        connection.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+
+def execute_job(job_id, kind, kwargs, owner_pid=None):
+    """Job pool entry point: run a task and record its outcome in the job store.
+
+    In a pool process the job's spans are collected and returned, so the submitting
+    worker can add them to its own /metrics.
+    """
+    global _job_spans
+    def progress(fraction, message=''):
+        update_job(job_id, progress=fraction, message=message)
+    
+    collect = owner_pid is not None and owner_pid != os.getpid()
+    if collect:
+        _job_spans = []
+    update_job(job_id, state='running')
     try:
-        if DB_TYPE == 'postgresql':
-            # PostgreSQL connection
-            connection = psycopg2.connect(DB_CONFIG)
-            connection.autocommit = False
-        else:
-            # MySQL connection
-            connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to {DB_TYPE}: {e}")
-        return None
+        with span(f'job_{kind}'):
+            result = TASKS[kind](progress=progress, **kwargs)
+        # The final message replaces the last progress message, even if nobody polled in between
+        update_job(job_id, state='done', progress=1.0, message=result['response'].get('message', 'Done'),
+                   result=json.dumps(result))
+    except Exception as e:
+        update_job(job_id, state='failed', message='Failed', error=str(e))
+    spans = None
+    if collect:
+        spans, _job_spans = _job_spans, None
+    return spans
 
-def init_database():
-    """Initialize the database if it doesn't exist"""
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+def _reset_job_executor_after_fork():
+    """Forked children must not reuse the parent's pool (its workers belong to the parent)"""
+    global _job_executor, _job_executor_lock
+    _job_executor = None
+    _job_executor_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_job_executor_after_fork)
+
+def job_process_context():
+    """Start method for job processes.
+
+    Workers run threads (the dataset sweeper, request threads) that may hold a lock at the
+    moment of a fork, and a forked job would inherit it locked forever. Jobs are therefore
+    forked from a clean forkserver process that has imported the app once (spawned where
+    forkserver is unavailable).
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+def get_job_executor():
+    """Return this worker's job pool, creating it on first use"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            if JOB_EXECUTOR == 'thread':
+                _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+            else:
+                _job_executor = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=job_process_context())
+        return _job_executor
+
+def _record_job_outcome(job_id, future):
+    """Merge a finished job's spans, or mark it failed if its pool worker died before
+    the job could record an outcome"""
+    global _job_executor
+    error = future.exception()
+    if error is None:
+        for phase, seconds, rows, nbytes in future.result() or ():
+            record_span(phase, seconds, rows, nbytes)
+        return
+    update_job(job_id, state='failed', error=f'Job worker crashed: {error}')
+    with _job_executor_lock:
+        if getattr(_job_executor, '_broken', False):
+            _job_executor = None
+
+def submit_job(kind, kwargs):
+    """Queue a task for background execution and return the job id"""
+    purge_expired_jobs()
+    job_id = create_job(kind, get_session_id())
+    future = get_job_executor().submit(execute_job, job_id, kind, kwargs, os.getpid())
+    future.add_done_callback(partial(_record_job_outcome, job_id))
+    return job_id
+
+def wants_async():
+    """True if the client asked for a background job (async=true in query, form or JSON body)"""
+    data = request.get_json(silent=True)
+    value = request.args.get('async') or request.form.get('async')
+    if value is None and isinstance(data, dict):
+        value = data.get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def run_task(kind, **kwargs):
+    """Run a task inline, or queue it as a background job when the client asked for async"""
+    if wants_async():
+        job_id = submit_job(kind, kwargs)
+        return jsonify({'success': True, 'job_id': job_id,
+                        'status_url': url_for('job_status', job_id=job_id)})
+    result = TASKS[kind](**kwargs)
+    apply_task_session(result)
+    return jsonify(result['response'])
+
+def report_nothing(fraction, message=''):
+    """Default progress callback for tasks run inline"""
+
+def hash_upload(file, path=None, block_size=1 << 20):
+    """SHA-256 of an uploaded file, read once block by block.
+
+    With path the blocks are also written there; otherwise the stream is rewound so the
+    upload can still be parsed.
+    """
+    digest = hashlib.sha256()
+    stream = file.stream
+    out = open(path, 'wb') if path else None
     try:
-        if DB_TYPE == 'postgresql':
-            # PostgreSQL: Database is already created by Render
-            conn = get_db_connection()
-            if conn:
-                print(f"Database connection is ready (PostgreSQL).")
-                conn.close()
-        else:
-            # MySQL: Create database if it doesn't exist
-            conn = mysql.connector.connect(
-                host=DB_CONFIG['host'],
-                user=DB_CONFIG['user'],
-                password=DB_CONFIG['password']
-            )
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
-            cursor.close()
-            conn.close()
-            print(f"Database '{DB_CONFIG['database']}' is ready (MySQL).")
-    except Error as e:
-        print(f"Error creating database: {e}")
+        for block in iter(lambda: stream.read(block_size), b''):
+            digest.update(block)
+            if out:
+                out.write(block)
+    finally:
+        if out:
+            out.close()
+    if not path:
+        stream.seek(0)
+    return digest.hexdigest()
+
+def open_upload_source(source):
+    """Return a seekable binary stream for an upload given as a path or a file object"""
+    if isinstance(source, str):
+        return open(source, 'rb')
+    return getattr(source, 'stream', source)
+
+def records_to_chunks(records, chunk_rows, convert_numeric=False):
+    """Group an iterator of row dicts/lists into DataFrame chunks of chunk_rows rows"""
+    while True:
+        batch = list(itertools.islice(records, chunk_rows))
+        if not batch:
+            return
+        chunk = pd.DataFrame.from_records(batch)
+        if convert_numeric:
+            # Text-only sources (XML): parse numeric-looking columns like read_xml would
+            for col in chunk.columns:
+                try:
+                    chunk[col] = pd.to_numeric(chunk[col].replace('', None))
+                except (ValueError, TypeError):
+                    pass
+        yield chunk
+
+def iter_json_array_records(stream, block_size=1 << 16):
+    """Incrementally decode the objects of a top-level JSON array without loading the whole file"""
+    reader = io.TextIOWrapper(stream, encoding='utf-8')
+    decoder = json.JSONDecoder()
+    buffer = reader.read(block_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Expected a JSON array of records')
+    pos = 1
+    eof = False
+    while True:
+        # Skip separators, pulling in more text whenever the buffer runs dry
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            block = reader.read(block_size)
+            eof = not block
+            buffer, pos = buffer[pos:] + block, 0
+        if pos >= len(buffer):
+            raise ValueError('Unterminated JSON array')
+        if buffer[pos] == ']':
+            return
+        if buffer[pos] not in '{[':
+            raise ValueError('JSON array elements must be objects or arrays')
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Element continues past the buffer (objects/arrays cannot parse early)
+            if eof:
+                raise
+            block = reader.read(block_size)
+            eof = not block
+            buffer, pos = buffer[pos:] + block, 0
+            continue
+        yield record
+        pos = end
+
+def iter_xml_records(stream):
+    """Yield one dict per row element (children of the root) using iterparse, freeing each row"""
+    root = None
+    depth = 0
+    for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            record = dict(element.attrib)
+            for child in element:
+                record[child.tag.rsplit('}', 1)[-1]] = child.text
+            yield record
+            root.clear()
 
-def save_dataframe_to_db(df, table_name):
-    """Save a pandas DataFrame to database (works for both MySQL and PostgreSQL)"""
+def iter_upload_chunks(source, file_ext, chunk_rows=None):
+    """Read an uploaded CSV, JSON or XML file as an iterator of DataFrame chunks.
+
+    CSV and JSON lines are read with pandas chunking, JSON arrays are decoded object by
+    object and XML with iterparse; other JSON layouts (column-oriented objects) are read
+    whole as before.
+    """
+    chunk_rows = chunk_rows or UPLOAD_CHUNK_ROWS
+    stream = open_upload_source(source)
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return False
-        
-        cursor = connection.cursor()
-        
-        # Drop table if exists
-        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-        
-        # Create table dynamically based on DataFrame columns
-        columns_sql = []
-        for col in df.columns:
-            # Determine SQL data type based on pandas dtype
-            dtype = df[col].dtype
-            if dtype == 'int64':
-                sql_type = 'INTEGER' if DB_TYPE == 'postgresql' else 'INT'
-            elif dtype == 'float64':
-                sql_type = 'DOUBLE PRECISION' if DB_TYPE == 'postgresql' else 'DOUBLE'
+        if file_ext == 'csv':
+            yield from pd.read_csv(stream, chunksize=chunk_rows)
+        elif file_ext == 'xml':
+            yield from records_to_chunks(iter_xml_records(stream), chunk_rows, convert_numeric=True)
+        elif file_ext == 'json':
+            start = stream.tell()
+            first_line = stream.readline().strip()
+            second_line = stream.readline().strip()
+            stream.seek(start)
+            if first_line.startswith(b'['):
+                yield from records_to_chunks(iter_json_array_records(stream), chunk_rows)
+            elif is_json_lines(first_line, second_line):
+                yield from pd.read_json(stream, lines=True, chunksize=chunk_rows)
             else:
-                sql_type = 'TEXT'
-            
-            # Handle column names with spaces or special characters
-            col_name = f'"{col}"' if DB_TYPE == 'postgresql' else f'`{col}`'
-            columns_sql.append(f'{col_name} {sql_type}')
-        
-        create_table_sql = f"CREATE TABLE {table_name} ({', '.join(columns_sql)})"
-        cursor.execute(create_table_sql)
-        
-        # Insert data with appropriate placeholder
-        placeholder = '%s'  # Works for both MySQL and PostgreSQL
+                yield pd.read_json(stream)
+    finally:
+        if isinstance(source, str):
+            stream.close()
+
+def is_json_lines(first_line, second_line):
+    """True if a JSON file's first lines look like JSON lines rather than one JSON document"""
+    try:
+        record = json.loads(first_line)
+    except ValueError:
+        return False
+    if not isinstance(record, dict):
+        return False
+    # A single-line file is JSON lines only if it is one flat record, not a column mapping
+    return bool(second_line) or not any(isinstance(value, (dict, list)) for value in record.values())
+
+def upload_data_task(source, file_ext, table_name, owner=None, content_key=None, delete_source=False,
+                     progress=report_nothing):
+    """Stream an uploaded file into a new dataset table chunk by chunk"""
+    chunks = None
+    try:
+        progress(0.1, 'Reading file')
+        chunks = iter_upload_chunks(source, file_ext)
+        first = next(chunks, None)
+        if first is None:
+            return {'response': {'success': False, 'message': 'Error processing file: no rows found'}}
         
-        for _, row in df.iterrows():
-            placeholders = ', '.join([placeholder] * len(row))
-            
-            # Column names with proper quoting
-            if DB_TYPE == 'postgresql':
-                columns = ', '.join([f'"{col}"' for col in df.columns])
-            else:
-                columns = ', '.join([f'`{col}`' for col in df.columns])
-            
-            insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-            cursor.execute(insert_sql, tuple(row))
+        def saved(rows):
+            progress(0.5, f'{rows:,} rows saved')
         
-        connection.commit()
-        cursor.close()
-        connection.close()
+        if save_dataframe_chunks_to_db(itertools.chain([first], chunks), table_name, progress=saved, owner=owner):
+            if content_key:
+                index_dataset_content(content_key, table_name)
+            return {'response': {'success': True, 'message': 'File uploaded successfully'},
+                    'session': {'table_name': table_name, 'columns': list(first.columns), **pipeline_session([])}}
+        return {'response': {'success': False, 'message': 'Database error'}}
+    except Exception as e:
+        return {'response': {'success': False, 'message': f'Error processing file: {str(e)}'}}
+    finally:
+        if chunks is not None:
+            chunks.close()
+        if delete_source:
+            os.remove(source)
+
+def handle_outliers_task(table_name, columns, method, rule='iqr', fmt='png', steps=(), progress=report_nothing):
+    """Cap or trim outliers (IQR, z-score, MAD or percentile fences) and render a before/after boxplot"""
+    progress(0.1, 'Loading data')
+    df, version = replay_pipeline(table_name, steps)
+    if df is None:
+        return {'response': {'success': False, 'message': 'Error loading data'}}
+    
+    progress(0.4, 'Handling outliers')
+    message = f'Outliers handled using {method} ({rule} fences)'
+    processed, step = extend_pipeline(
+        table_name, version, steps, df, 'handle_outliers', {'columns': columns, 'method': method, 'rule': rule}, message
+    )
+    
+    # Before/after image
+    progress(0.7, 'Rendering plot')
+    plot_id = plot_id_for(pipeline_cache_key(table_name, steps), version, columns, f'outliers_{rule}_{method}', fmt)
+    plot = render_plot(plot_id, table_name, fmt, lambda: draw_outlier_comparison(df, processed, columns))
+    return {'response': dict(plot, success=True, message=message),
+            'pipeline_step': pipeline_step_result(table_name, steps, step)}
+
+def scale_data_task(table_name, columns, method, steps=(), progress=report_nothing):
+    """Scale numerical columns with a StandardScaler or MinMaxScaler"""
+    progress(0.1, 'Loading data')
+    # With no earlier steps the scaler is fit on just its own columns
+    df, version = replay_pipeline(table_name, steps, columns=None if steps else columns)
+    if df is None:
+        return {'response': {'success': False, 'message': 'Error loading data'}}
+    
+    progress(0.4, 'Scaling columns')
+    message = f'{len(columns)} columns scaled using {method} scaler'
+    _, step = extend_pipeline(
+        table_name, version, steps, df, 'scale_data', {'columns': columns, 'method': method}, message,
+        cache=bool(steps)
+    )
+    return {'response': {'success': True, 'message': message},
+            'pipeline_step': pipeline_step_result(table_name, steps, step)}
+
+def training_task(table_name, algorithm, target, test_size, random_state, steps=(), progress=report_nothing):
+    """Fit, evaluate and persist a model together with its fitted preprocessing steps"""
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, accuracy_score
+    progress(0.1, 'Loading data')
+    df, transformers = fit_pipeline(table_name, steps)
+    if df is None:
+        return {'response': {'success': False, 'message': 'Error loading data'}}
+    
+    # Prepare data
+    X = df.drop(columns=[target])
+    y = df[target]
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    
+    # Train model
+    progress(0.3, 'Fitting model')
+    model = build_model(algorithm)
+    with span('fit') as info:
+        info['rows'] = len(X_train)
+        model.fit(X_train, y_train)
+    with span('predict') as info:
+        info['rows'] = len(X_test)
+        y_pred = model.predict(X_test)
+    
+    # Calculate metrics
+    scores = {}
+    if algorithm in ['linear', 'ridge', 'lasso']:
+        scores['r2_score'] = float(r2_score(y_test, y_pred))
+        scores['mse'] = float(mean_squared_error(y_test, y_pred))
+        scores['mae'] = float(mean_absolute_error(y_test, y_pred))
+        scores['rmse'] = float(np.sqrt(scores['mse']))
+    else:
+        scores['accuracy'] = float(accuracy_score(y_test, y_pred.round()))
+    
+    # Persist the fitted preprocessing and model as one Pipeline so /predict takes raw inputs
+    progress(0.8, 'Saving model')
+    model_id = save_model(Pipeline(transformers + [('model', model)]), algorithm, target, X.columns)
+    if model_id is None:
+        return {'response': {'success': False, 'message': 'Database error while saving model'}}
+    
+    session_updates = trained_model_session(model_id, algorithm, target, X.columns, model)
+    return {'response': {'success': True, 'metrics': scores}, 'session': session_updates}
+
+def trained_model_session(model_id, algorithm, target, feature_columns, model):
+    """Session keys describing a freshly trained model"""
+    session_updates = {
+        'model_id': model_id,
+        'model_type': algorithm,
+        'target_column': target,
+        'feature_columns': list(feature_columns),
+        'model_trained': True,
+    }
+    
+    # Store model coefficients or feature importance
+    if hasattr(model, 'coef_'):
+        session_updates['model_coef'] = model.coef_.tolist()
+    if hasattr(model, 'intercept_'):
+        # LogisticRegression keeps one intercept per class row
+        intercept = np.ravel(model.intercept_)
+        session_updates['model_intercept'] = float(intercept[0]) if intercept.size == 1 else intercept.tolist()
+    return session_updates
+
+def incremental_training_task(table_name, algorithm, target, test_size, random_state, epochs=INCREMENTAL_EPOCHS,
+                              steps=(), progress=report_nothing):
+    """Train an SGD model out of core: every pass streams the table in chunks, none loads it whole.
+
+    Passes: one per preprocessing step, one to fit the feature scaler (and collect class
+    labels), `epochs` of partial_fit, and one to score the held-out rows.
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    progress(0.05, 'Fitting preprocessing')
+    transformers = fit_pipeline_incremental(table_name, steps)
+    
+    def chunks():
+        return iter_training_chunks(table_name, transformers, test_size, random_state)
+    
+    # SGD needs standardized features; the scaler is fit incrementally on the training rows
+    progress(0.2, 'Fitting feature scaler')
+    scaler = StandardScaler()
+    classes = set()
+    feature_columns = None
+    for chunk, is_test in chunks():
+        train = chunk[~is_test]
+        if train.empty:
+            continue
+        X = train.drop(columns=[target])
+        feature_columns = list(X.columns)
+        scaler.partial_fit(X)
+        if algorithm == 'logistic':
+            classes.update(train[target].unique())
+    if feature_columns is None:
+        return {'response': {'success': False, 'message': 'No training rows in the dataset'}}
+    
+    model = build_incremental_model(algorithm, random_state)
+    fit_params = {'classes': np.array(sorted(classes))} if algorithm == 'logistic' else {}
+    rng = np.random.default_rng(random_state)
+    rows_trained = 0
+    for epoch in range(epochs):
+        progress(0.3 + 0.6 * epoch / epochs, f'Epoch {epoch + 1} of {epochs}')
+        rows_trained = 0
+        for chunk, is_test in chunks():
+            train = chunk[~is_test]
+            if train.empty:
+                continue
+            # Shuffle within the chunk so SGD does not follow the table's storage order
+            train = train.iloc[rng.permutation(len(train))]
+            with span('fit') as info:
+                info['rows'] = len(train)
+                model.partial_fit(scaler.transform(train.drop(columns=[target])), train[target].to_numpy(), **fit_params)
+            rows_trained += len(train)
+    
+    # Metrics accumulated over the held-out rows, one chunk at a time
+    progress(0.9, 'Evaluating')
+    n = sse = sae = sum_y = sum_y2 = correct = 0.0
+    for chunk, is_test in chunks():
+        test = chunk[is_test]
+        if test.empty:
+            continue
+        y_test = test[target].to_numpy()
+        y_pred = model.predict(scaler.transform(test.drop(columns=[target])))
+        n += len(test)
+        if algorithm == 'logistic':
+            correct += float((y_pred == y_test).sum())
+        else:
+            errors = y_test.astype(float) - y_pred
+            sse += float(np.square(errors).sum())
+            sae += float(np.abs(errors).sum())
+            sum_y += float(y_test.sum())
+            sum_y2 += float(np.square(y_test.astype(float)).sum())
+    if n == 0:
+        return {'response': {'success': False, 'message': 'No held-out rows to evaluate; increase the test size'}}
+    
+    scores = {}
+    if algorithm == 'logistic':
+        scores['accuracy'] = correct / n
+    else:
+        total = sum_y2 - sum_y ** 2 / n
+        scores['r2_score'] = 1 - sse / total if total > 0 else 0.0
+        scores['mse'] = sse / n
+        scores['mae'] = sae / n
+        scores['rmse'] = float(np.sqrt(scores['mse']))
+    
+    progress(0.95, 'Saving model')
+    pipeline = Pipeline(transformers + [('feature_scaler', scaler), ('model', model)])
+    model_id = save_model(pipeline, algorithm, target, feature_columns)
+    if model_id is None:
+        return {'response': {'success': False, 'message': 'Database error while saving model'}}
+    
+    session_updates = trained_model_session(model_id, algorithm, target, feature_columns, model)
+    return {'response': {'success': True, 'metrics': scores, 'rows_trained': rows_trained,
+                         'rows_tested': int(n), 'epochs': epochs},
+            'session': session_updates}
+
+def is_classification_target(y):
+    """True when the target looks like class labels rather than a continuous value"""
+    from preprocessors import is_numeric_column
+    if pd.api.types.is_bool_dtype(y.dtype):
         return True
-    except Error as e:
-        print(f"Error saving DataFrame to database: {e}")
-        if connection:
-            connection.rollback()
+    if not is_numeric_column(y):
         return False
+    values = y.dropna()
+    return bool((values == values.round()).all()) and values.nunique() <= CLASSIFICATION_MAX_CLASSES
 
-def load_dataframe_from_db(table_name):
-    """Load a pandas DataFrame from database (works for both MySQL and PostgreSQL)"""
-    try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-        
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql(query, connection)
-        connection.close()
-        return df
-    except Error as e:
-        print(f"Error loading DataFrame from database: {e}")
-        return None
+def score_fold(X, y, algorithm, params, train_idx, test_idx, metric):
+    """Fit one candidate on one fold; returns (score, fit seconds)"""
+    from sklearn.metrics import r2_score, accuracy_score
+    model = build_model(algorithm, **params)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    y_pred = model.predict(X[test_idx])
+    if metric == 'r2':
+        return float(r2_score(y[test_idx], y_pred)), fit_seconds
+    return float(accuracy_score(y[test_idx], y_pred.round())), fit_seconds
+
+def compare_models_task(table_name, target, folds=CV_FOLDS, random_state=42, steps=(), progress=report_nothing):
+    """Cross-validate every algorithm and grid point in parallel and rank them by mean score"""
+    from sklearn.model_selection import KFold
+    from joblib import Parallel, delayed, effective_n_jobs
+    progress(0.1, 'Loading data')
+    df = load_processed_dataframe(table_name, steps)
+    if df is None:
+        return {'response': {'success': False, 'message': 'Error loading data'}}
+    
+    # One contiguous float matrix; joblib memmaps it once for all workers
+    X = np.ascontiguousarray(df.drop(columns=[target]).to_numpy(dtype=float))
+    y = df[target].to_numpy(dtype=float)
+    classification = is_classification_target(df[target])
+    metric = 'accuracy' if classification else 'r2'
+    
+    candidates, skipped = [], []
+    for algorithm, grid in MODEL_GRIDS.items():
+        if algorithm == 'logistic' and not classification:
+            skipped.append({'algorithm': algorithm, 'reason': 'Target is continuous'})
+            continue
+        candidates += [(algorithm, params) for params in grid]
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=random_state).split(X))
+    
+    progress(0.3, f'Fitting {len(candidates) * len(splits)} models')
+    start = time.perf_counter()
+    parallel = Parallel(n_jobs=CV_JOBS, max_nbytes=CV_MEMMAP_BYTES, mmap_mode='r')
+    results = parallel(delayed(score_fold)(X, y, algorithm, params, train_idx, test_idx, metric)
+                       for algorithm, params in candidates
+                       for train_idx, test_idx in splits)
+    elapsed = time.perf_counter() - start
+    record_span('fit', elapsed, rows=len(X) * len(candidates))
+    
+    # Results come back in submission order: len(splits) consecutive folds per candidate
+    leaderboard = []
+    for i, (algorithm, params) in enumerate(candidates):
+        scores, fit_times = np.array(results[i * len(splits):(i + 1) * len(splits)]).T
+        leaderboard.append({
+            'algorithm': algorithm,
+            'params': params,
+            'score_mean': float(scores.mean()),
+            'score_std': float(scores.std()),
+            'fit_seconds_mean': float(fit_times.mean()),
+            'fit_seconds_total': float(fit_times.sum()),
+        })
+    leaderboard.sort(key=lambda entry: entry['score_mean'], reverse=True)
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry['rank'] = rank
+    
+    return {'response': {
+        'success': True,
+        'problem': 'classification' if classification else 'regression',
+        'metric': metric,
+        'folds': len(splits),
+        'n_jobs': effective_n_jobs(CV_JOBS),
+        'elapsed_seconds': elapsed,
+        'leaderboard': leaderboard,
+        'skipped': skipped,
+    }}
+
+# Work that can run inline or as a background job; each returns
+# {'response': <JSON payload>, 'session': <session keys to set>} and, for preprocessing,
+# 'pipeline_step' (see pipeline_step_result) instead of a whole new pipeline
+TASKS = {
+    'upload_data': upload_data_task,
+    'handle_outliers': handle_outliers_task,
+    'scale_data': scale_data_task,
+    'training': training_task,
+    'compare_models': compare_models_task,
+    'incremental_training': incremental_training_task,
+}
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def track_dataset_access():
+    """Keep the session's dataset from expiring while the session is in use"""
+    start_dataset_sweeper()
+    if 'table_name' in session:
+        touch_dataset(session['table_name'])
+
+@app.after_request
+def record_request_timing(response):
+    """Observe the request's latency and report its phases in a Server-Timing header.
+
+    Streamed responses are timed up to their headers; the body's chunks are still
+    recorded as db_stream / predict spans when they are produced.
+    """
+    start = g.pop('request_start', None)
+    if not METRICS_ENABLED or start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.observe('mlapp_request_duration_seconds', elapsed,
+                    route=route, method=request.method, status=str(response.status_code))
+    timings = [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in g.get('server_timing', {}).items()]
+    timings.append(f'total;dur={elapsed * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(timings)
+    flush_metrics()
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request, phase, pool and cache metrics of all workers in Prometheus text format"""
+    if not METRICS_ENABLED:
+        abort(404)
+    return Response(render_all_metrics(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/')
 def index():
@@ -187,6 +3411,48 @@ def data_source():
     """Data source selection page"""
     return render_template('data_source.html')
 
+@app.route('/db_pool_stats')
+def db_pool_stats_route():
+    """Connection pool counters for monitoring"""
+    return jsonify({'success': True, 'pool': db_pool_stats()})
+
+@app.route('/cache_stats')
+def cache_stats():
+    """DataFrame cache counters for monitoring"""
+    return jsonify({'success': True,
+                    'dataframe_cache': dataframe_cache.snapshot(),
+                    'model_cache': model_cache.snapshot(),
+                    'plot_cache': plot_cache_stats(),
+                    'upload_dedup': upload_dedup_snapshot(),
+                    'dataset_memory': dict(dataset_memory_savings)})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Poll a background job; a finished job's session changes are applied on first read.
+
+    A preprocessing step is only added if the session's pipeline has not changed since the
+    job was submitted; otherwise the job reports that its step was discarded.
+    """
+    job = get_job(job_id)
+    if job is None or job['owner'] != session.get('session_id'):
+        return jsonify({'success': False, 'message': 'Job not found'})
+    
+    result = None
+    if job['state'] == 'done':
+        result = json.loads(job['result'])
+        if not job['applied'] and claim_job_result(job_id):
+            conflict = apply_task_session(result)
+            if conflict:
+                update_job(job_id, applied=-1, error=conflict)
+                job.update(applied=-1, error=conflict)
+    
+    payload = {'success': True, 'job': {
+        key: job[key] for key in ('job_id', 'kind', 'state', 'progress', 'message', 'error', 'created_at', 'updated_at')
+    }}
+    if result is not None:
+        payload['result'] = result['response'] if job['applied'] != -1 else {'success': False, 'message': job['error']}
+    return jsonify(payload)
+
 @app.route('/create_csv', methods=['GET', 'POST'])
 def create_csv():
     """Manual CSV creation interface"""
@@ -203,8 +3469,8 @@ def create_csv():
             df = pd.DataFrame(rows, columns=columns)
             
             # Save to database
-            table_name = f"user_data_{session.get('session_id', 'default')}"
-            if save_dataframe_to_db(df, table_name):
+            table_name = new_dataset_name()
+            if save_dataframe_to_db(df, table_name, owner=get_session_id()):
                 session['table_name'] = table_name
                 session['columns'] = list(df.columns)
                 return jsonify({'success': True, 'message': 'Data saved successfully'})
@@ -233,25 +3499,35 @@ def upload_data():
             filename = secure_filename(file.filename)
             file_ext = filename.rsplit('.', 1)[1].lower()
             
-            # Read file based on type
-            if file_ext == 'csv':
-                df = pd.read_csv(file)
-            elif file_ext == 'json':
-                df = pd.read_json(file)
-            elif file_ext == 'xml':
-                df = pd.read_xml(file)
+            path = None
+            if wants_async():
+                # The job reads the file from disk after this request has finished
+                path = os.path.join(JOB_UPLOAD_DIR, f'upload_{uuid.uuid4().hex}.{file_ext}')
+            
+            # Hash the upload as it is read (and saved for the job), then reuse an identical dataset
+            content_key = None
+            if UPLOAD_DEDUP:
+                content_key = f"{file_ext}:{hash_upload(file, path)}"
+                existing = claim_dataset_by_content(content_key)
+                record_upload_dedup(existing is not None)
+                if existing is not None:
+                    if path:
+                        os.remove(path)
+                    session.update({'table_name': existing, 'columns': get_dataset_columns(existing),
+                                    **pipeline_session([])})
+                    return jsonify({'success': True, 'message': 'File uploaded successfully', 'deduplicated': True})
+            elif path:
+                file.save(path)
             
             # Generate unique table name
-            import time
-            table_name = f"user_data_{int(time.time())}"
+            table_name = new_dataset_name()
+            owner = get_session_id()
             
-            # Save to database
-            if save_dataframe_to_db(df, table_name):
-                session['table_name'] = table_name
-                session['columns'] = list(df.columns)
-                return jsonify({'success': True, 'message': 'File uploaded successfully'})
-            else:
-                return jsonify({'success': False, 'message': 'Database error'})
+            if path:
+                return run_task('upload_data', source=path, file_ext=file_ext, table_name=table_name,
+                                owner=owner, content_key=content_key, delete_source=True)
+            return run_task('upload_data', source=file, file_ext=file_ext, table_name=table_name,
+                            owner=owner, content_key=content_key)
         except Exception as e:
             return jsonify({'success': False, 'message': f'Error processing file: {str(e)}'})
     
@@ -263,21 +3539,12 @@ def visualization():
     if 'table_name' not in session:
         return redirect(url_for('data_source'))
     
-    df = load_dataframe_from_db(session['table_name'])
-    if df is None:
+    summary = run_aggregate(session['table_name'], pushdown_summary, summarize_dataframe,
+                            steps=session.get('pipeline', []))
+    if summary is None:
         return redirect(url_for('data_source'))
     
-    # Prepare data info
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    info_str = buffer.getvalue()
-    
-    return render_template('visualization.html',
-                         columns=list(df.columns),
-                         head_html=df.head(10).to_html(classes='table table-striped', index=False),
-                         info=info_str,
-                         dtypes=df.dtypes.to_dict(),
-                         describe_html=df.describe().to_html(classes='table table-striped'))
+    return render_template('visualization.html', **summary)
 
 @app.route('/get_value_counts', methods=['POST'])
 def get_value_counts():
@@ -285,20 +3552,21 @@ def get_value_counts():
     try:
         data = request.json
         columns = data.get('columns', [])
+        limit = int(data.get('limit', VALUE_COUNTS_LIMIT))
         
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
+        results = run_aggregate(
+            session['table_name'],
+            lambda connection, table_name, schema: pushdown_value_counts(connection, table_name, schema, columns, limit),
+            lambda df: value_counts_dataframe(df, columns, limit),
+            steps=session.get('pipeline', []),
+            columns=columns
+        )
+        if results is None:
             return jsonify({'success': False, 'message': 'Error loading data'})
         
-        results = {}
-        for col in columns:
-            if col in df.columns:
-                value_counts = df[col].value_counts().to_dict()
-                results[col] = value_counts
-        
         return jsonify({'success': True, 'data': results})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -309,13 +3577,13 @@ def preprocessing():
     if 'table_name' not in session:
         return redirect(url_for('data_source'))
     
-    df = load_dataframe_from_db(session['table_name'])
+    df = load_processed_dataframe(session['table_name'], session.get('pipeline', []))
     if df is None:
         return redirect(url_for('data_source'))
     
     # Get numeric and categorical columns
     numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
     
     return render_template('preprocessing.html',
                          numeric_columns=numeric_cols,
@@ -332,30 +3600,7 @@ def handle_missing():
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
-            return jsonify({'success': False, 'message': 'Error loading data'})
-        
-        if method == 'drop':
-            df = df.dropna()
-        elif method in ['mean', 'median', 'mode']:
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            if method == 'mean':
-                df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
-            elif method == 'median':
-                df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
-            elif method == 'mode':
-                for col in df.columns:
-                    if df[col].isna().any():
-                        mode_val = df[col].mode()
-                        if len(mode_val) > 0:
-                            df[col].fillna(mode_val[0], inplace=True)
-        
-        # Save processed data
-        if save_dataframe_to_db(df, session['table_name']):
-            return jsonify({'success': True, 'message': f'Missing values handled using {method}'})
-        else:
-            return jsonify({'success': False, 'message': 'Database error'})
+        return add_pipeline_step('handle_missing', {'method': method}, f'Missing values handled using {method}')
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -365,98 +3610,71 @@ def visualize_outliers():
     try:
         data = request.json
         columns = data.get('columns', [])
+        fmt = data.get('format', 'png')
         
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
+        if fmt not in PLOT_FORMATS:
+            return jsonify({'success': False, 'message': f'Unsupported image format: {fmt}'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
+        table_name = session['table_name']
+        steps = session.get('pipeline', [])
+        version = get_dataset_version(table_name)
+        if version is None:
             return jsonify({'success': False, 'message': 'Error loading data'})
         
-        # Create boxplot
-        fig, ax = plt.subplots(figsize=(10, 6))
-        df[columns].boxplot(ax=ax)
-        ax.set_title('Outlier Detection - Before Handling')
-        ax.set_xlabel('Columns')
-        ax.set_ylabel('Values')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Convert plot to base64
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode()
-        plt.close()
-        
-        return jsonify({'success': True, 'image': image_base64})
+        def draw():
+            stats = run_aggregate(
+                table_name,
+                lambda connection, table_name, schema: pushdown_boxplot_stats(connection, table_name, schema, columns),
+                lambda df: boxplot_stats(df, columns),
+                steps=steps,
+                columns=columns
+            )
+            if stats is None:
+                raise RuntimeError('Error loading data')
+            return draw_outlier_boxplot(stats)
+        
+        plot_id = plot_id_for(pipeline_cache_key(table_name, steps), version, columns, 'outliers', fmt)
+        plot = render_plot(plot_id, table_name, fmt, draw)
+        return jsonify(dict(plot, success=True))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/plots/<plot_id>')
+def plot_image(plot_id):
+    """Serve a rendered plot; clients revalidate with If-None-Match"""
+    row = get_cached_plot(plot_id)
+    if row is None or row['table_name'] != session.get('table_name'):
+        abort(404)
+    
+    response = Response(row['image'], mimetype=row['mimetype'])
+    response.set_etag(plot_id)
+    response.cache_control.private = True
+    response.cache_control.max_age = PLOT_MAX_AGE
+    response.headers['X-Render-Seconds'] = f"{row['render_seconds']:.4f}"
+    return response.make_conditional(request)
+
 @app.route('/handle_outliers', methods=['POST'])
 def handle_outliers():
     """Handle outliers using capping or trimming"""
+    from preprocessors import OUTLIER_RULES
     try:
         data = request.json
         columns = data.get('columns', [])
         method = data.get('method')  # 'capping' or 'trimming'
+        rule = data.get('rule', 'iqr')  # 'iqr', 'zscore', 'mad' or 'percentile'
+        fmt = data.get('format', 'png')
         
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
+        if rule not in OUTLIER_RULES:
+            return jsonify({'success': False, 'message': f'Unknown outlier rule: {rule}'})
+        if fmt not in PLOT_FORMATS:
+            return jsonify({'success': False, 'message': f'Unsupported image format: {fmt}'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
-            return jsonify({'success': False, 'message': 'Error loading data'})
-        
-        # Before handling image
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-        df[columns].boxplot(ax=ax1)
-        ax1.set_title('Before Handling Outliers')
-        ax1.set_xlabel('Columns')
-        ax1.set_ylabel('Values')
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # Handle outliers
-        df_processed = df.copy()
-        for col in columns:
-            if col in df_processed.columns and df_processed[col].dtype in [np.int64, np.float64]:
-                Q1 = df_processed[col].quantile(0.25)
-                Q3 = df_processed[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                
-                if method == 'capping':
-                    # Winsorizing
-                    df_processed[col] = df_processed[col].clip(lower_bound, upper_bound)
-                elif method == 'trimming':
-                    # Remove outliers
-                    df_processed = df_processed[
-                        (df_processed[col] >= lower_bound) & 
-                        (df_processed[col] <= upper_bound)
-                    ]
-        
-        # After handling image
-        df_processed[columns].boxplot(ax=ax2)
-        ax2.set_title('After Handling Outliers')
-        ax2.set_xlabel('Columns')
-        ax2.set_ylabel('Values')
-        ax2.tick_params(axis='x', rotation=45)
-        
-        plt.tight_layout()
-        
-        # Convert plot to base64
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode()
-        plt.close()
-        
-        # Save processed data
-        if save_dataframe_to_db(df_processed, session['table_name']):
-            return jsonify({'success': True, 'image': image_base64, 'message': f'Outliers handled using {method}'})
-        else:
-            return jsonify({'success': False, 'message': 'Database error'})
+        return run_task('handle_outliers', table_name=session['table_name'], columns=columns, method=method,
+                        rule=rule, fmt=fmt, steps=session.get('pipeline', []))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -471,25 +3689,8 @@ def encode_data():
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
-            return jsonify({'success': False, 'message': 'Error loading data'})
-        
-        encoders = {}
-        for col in columns:
-            if col in df.columns:
-                le = LabelEncoder()
-                df[col] = le.fit_transform(df[col].astype(str))
-                encoders[col] = le
-        
-        # Store encoders in session for later use
-        session['encoders'] = {col: list(encoders[col].classes_) for col in encoders}
-        
-        # Save processed data
-        if save_dataframe_to_db(df, session['table_name']):
-            return jsonify({'success': True, 'message': f'{len(columns)} columns encoded using {method} encoding'})
-        else:
-            return jsonify({'success': False, 'message': 'Database error'})
+        return add_pipeline_step('encode_data', {'columns': columns, 'method': method},
+                                 f'{len(columns)} columns encoded using {method} encoding')
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -504,97 +3705,113 @@ def scale_data():
         if 'table_name' not in session:
             return jsonify({'success': False, 'message': 'No data loaded'})
         
-        df = load_dataframe_from_db(session['table_name'])
-        if df is None:
-            return jsonify({'success': False, 'message': 'Error loading data'})
-        
-        if method == 'standard':
-            scaler = StandardScaler()
-        else:
-            scaler = MinMaxScaler()
-        
-        df[columns] = scaler.fit_transform(df[columns])
-        
-        # Store scaler parameters
-        session['scaler_type'] = method
-        session['scaler_columns'] = columns
-        
-        # Save processed data
-        if save_dataframe_to_db(df, session['table_name']):
-            return jsonify({'success': True, 'message': f'{len(columns)} columns scaled using {method} scaler'})
-        else:
-            return jsonify({'success': False, 'message': 'Database error'})
+        return run_task('scale_data', table_name=session['table_name'], columns=columns, method=method,
+                        steps=session.get('pipeline', []))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
-@app.route('/training', methods=['GET', 'POST'])
-def training():
-    """Model training page"""
+@app.route('/pipeline')
+def pipeline_steps():
+    """List the preprocessing steps recorded for the current dataset"""
+    steps = session.get('pipeline', [])
+    return jsonify({'success': True,
+                    'steps': [{'op': step['op'], 'params': step['params'], 'message': step['message']} for step in steps],
+                    'can_undo': bool(steps),
+                    'can_redo': bool(session.get('pipeline_redo'))})
+
+@app.route('/pipeline/<action>', methods=['POST'])
+def pipeline_action(action):
+    """Undo, redo or reset recorded preprocessing steps (the raw table is never modified)"""
+    if 'table_name' not in session:
+        return jsonify({'success': False, 'message': 'No data loaded'})
+    
+    steps = session.get('pipeline', [])
+    redo = session.get('pipeline_redo', [])
+    if action == 'undo':
+        if not steps:
+            return jsonify({'success': False, 'message': 'Nothing to undo'})
+        session.update(pipeline_session(steps[:-1], redo + steps[-1:]))
+        message = f"Undid: {steps[-1]['message']}"
+    elif action == 'redo':
+        if not redo:
+            return jsonify({'success': False, 'message': 'Nothing to redo'})
+        session.update(pipeline_session(steps + redo[-1:], redo[:-1]))
+        message = f"Redid: {redo[-1]['message']}"
+    elif action == 'reset':
+        session.update(pipeline_session([]))
+        message = 'All preprocessing steps removed'
+    else:
+        return jsonify({'success': False, 'message': f'Unknown pipeline action: {action}'})
+    return jsonify({'success': True, 'message': message})
+
+@app.route('/export_data')
+def export_data():
+    """Download the preprocessed dataset as CSV"""
     if 'table_name' not in session:
         return redirect(url_for('data_source'))
     
-    df = load_dataframe_from_db(session['table_name'])
+    df = load_processed_dataframe(session['table_name'], session.get('pipeline', []))
     if df is None:
         return redirect(url_for('data_source'))
     
-    columns = list(df.columns)
+    def generate():
+        for i, batch in enumerate(iter_dataframe_batches(df, UPLOAD_CHUNK_ROWS)):
+            yield batch.to_csv(index=False, header=(i == 0))
+    
+    return Response(generate(), mimetype='text/csv', headers={
+        'Content-Disposition': f"attachment; filename={session['table_name']}.csv"
+    })
+
+@app.route('/training', methods=['GET', 'POST'])
+def training():
+    """Model training page"""
+    if 'table_name' not in session:
+        return redirect(url_for('data_source'))
     
     if request.method == 'POST':
         try:
             data = request.json
-            algorithm = data.get('algorithm')
-            target = data.get('target')
-            test_size = float(data.get('test_size', 0.2))
-            random_state = int(data.get('random_state', 42))
-            
-            # Prepare data
-            X = df.drop(columns=[target])
-            y = df[target]
-            
-            # Split data
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=test_size, random_state=random_state
-            )
-            
-            # Train model
-            if algorithm == 'linear':
-                model = LinearRegression()
-            elif algorithm == 'ridge':
-                model = Ridge()
-            elif algorithm == 'lasso':
-                model = Lasso()
-            elif algorithm == 'logistic':
-                model = LogisticRegression(max_iter=1000)
-            
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            
-            # Calculate metrics
-            metrics = {}
-            if algorithm in ['linear', 'ridge', 'lasso']:
-                metrics['r2_score'] = float(r2_score(y_test, y_pred))
-                metrics['mse'] = float(mean_squared_error(y_test, y_pred))
-                metrics['mae'] = float(mean_absolute_error(y_test, y_pred))
-                metrics['rmse'] = float(np.sqrt(metrics['mse']))
-            else:
-                metrics['accuracy'] = float(accuracy_score(y_test, y_pred.round()))
-            
-            # Store model info in session
-            session['model_type'] = algorithm
-            session['target_column'] = target
-            session['feature_columns'] = list(X.columns)
-            session['model_trained'] = True
-            
-            # Store model coefficients or feature importance
-            if hasattr(model, 'coef_'):
-                session['model_coef'] = model.coef_.tolist()
-            if hasattr(model, 'intercept_'):
-                session['model_intercept'] = float(model.intercept_)
-            
-            return jsonify({'success': True, 'metrics': metrics})
+            if data.get('mode') == 'compare':
+                folds = int(data.get('folds', CV_FOLDS))
+                if folds < 2:
+                    return jsonify({'success': False, 'message': 'Cross-validation needs at least 2 folds'})
+                return run_task('compare_models',
+                                table_name=session['table_name'],
+                                target=data.get('target'),
+                                folds=folds,
+                                random_state=int(data.get('random_state', 42)),
+                                steps=session.get('pipeline', []))
+            if data.get('mode') == 'incremental':
+                epochs = int(data.get('epochs', INCREMENTAL_EPOCHS))
+                if epochs < 1:
+                    return jsonify({'success': False, 'message': 'Incremental training needs at least 1 epoch'})
+                return run_task('incremental_training',
+                                table_name=session['table_name'],
+                                algorithm=data.get('algorithm'),
+                                target=data.get('target'),
+                                test_size=float(data.get('test_size', 0.2)),
+                                random_state=int(data.get('random_state', 42)),
+                                epochs=epochs,
+                                steps=session.get('pipeline', []))
+            return run_task('training',
+                            table_name=session['table_name'],
+                            algorithm=data.get('algorithm'),
+                            target=data.get('target'),
+                            test_size=float(data.get('test_size', 0.2)),
+                            random_state=int(data.get('random_state', 42)),
+                            steps=session.get('pipeline', []))
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)})
     
+    # Preprocessing steps never add or remove columns, so the recorded schema is enough
+    # and the page does not load a table that may be larger than the worker's memory
+    columns = get_dataset_columns(session['table_name'])
+    if columns is None:
+        df = load_processed_dataframe(session['table_name'], session.get('pipeline', []))
+        if df is None:
+            return redirect(url_for('data_source'))
+        columns = list(df.columns)
+    
     return render_template('training.html', columns=columns)
 
 @app.route('/predict', methods=['GET', 'POST'])
@@ -610,38 +3827,74 @@ def predict():
             data = request.json
             input_values = data.get('values', {})
             
-            # Prepare input data
-            input_df = pd.DataFrame([input_values])
+            record = load_model(session.get('model_id', ''))
+            if record is None:
+                return jsonify({'success': False, 'message': 'Trained model not found. Please train the model again.'})
             
-            # Recreate model (in production, you'd save/load the actual model)
-            df = load_dataframe_from_db(session['table_name'])
-            target = session['target_column']
-            X = df.drop(columns=[target])
-            y = df[target]
+            missing = [col for col in record['feature_columns'] if col not in input_values]
+            if missing:
+                return jsonify({'success': False, 'message': f"Missing feature columns: {', '.join(map(str, missing))}"})
             
-            algorithm = session['model_type']
-            if algorithm == 'linear':
-                model = LinearRegression()
-            elif algorithm == 'ridge':
-                model = Ridge()
-            elif algorithm == 'lasso':
-                model = Lasso()
-            elif algorithm == 'logistic':
-                model = LogisticRegression(max_iter=1000)
-            
-            model.fit(X, y)
-            
-            # Make prediction
-            prediction = model.predict(input_df)
+            with span('predict') as info:
+                info['rows'] = 1
+                if record.get('scorer') is not None:
+                    # Compiled linear model: NumPy only, no DataFrame or sklearn validation
+                    prediction = record['scorer'].predict_one(input_values)
+                else:
+                    # Prepare input data in the column order the model was trained on
+                    input_df = pd.DataFrame([input_values])[record['feature_columns']]
+                    prediction = record['model'].predict(input_df)[0]
             
             return jsonify({
                 'success': True, 
-                'prediction': float(prediction[0])
+                'prediction': float(prediction)
             })
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)})
     
-    return render_template('predict.html', feature_columns=feature_columns)
+    # Encoded features are entered as their original categories
+    from sklearn.pipeline import Pipeline
+    from preprocessors import CategoryEncoder
+    category_options = {}
+    record = load_model(session.get('model_id', ''))
+    if record is not None and isinstance(record['model'], Pipeline):
+        for _, step in record['model'].steps[:-1]:
+            if isinstance(step, CategoryEncoder):
+                category_options.update({col: classes for col, classes in step.classes_.items() if col in feature_columns})
+    
+    return render_template('predict.html', feature_columns=feature_columns, category_options=category_options)
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Score many rows at once; streams the input rows back with a prediction column"""
+    if not session.get('model_trained'):
+        return jsonify({'success': False, 'message': 'No trained model'})
+    
+    try:
+        record = load_model(session.get('model_id', ''))
+        if record is None:
+            return jsonify({'success': False, 'message': 'Trained model not found. Please train the model again.'})
+        
+        output_format = (request.args.get('format') or request.form.get('format') or 'csv').lower()
+        if output_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'message': 'Output format must be csv or ndjson'})
+        
+        # Validate against the first chunk before committing to a streamed 200 response
+        chunks = read_batch_input()
+        first = next(chunks, None)
+        if first is None or first.empty:
+            return jsonify({'success': False, 'message': 'No rows provided'})
+        missing = [col for col in record['feature_columns'] if col not in first.columns]
+        if missing:
+            return jsonify({'success': False, 'message': f"Missing feature columns: {', '.join(map(str, missing))}"})
+        
+        body = iter_batch_predictions(record, itertools.chain([first], chunks), output_format)
+        mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=predictions.{output_format}'
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
 
 if __name__ == '__main__':
     # Initialize database
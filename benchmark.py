@@ -0,0 +1,373 @@
+"""
+Performance Benchmarks
+Run this script against a configured database to measure the app's hot paths
+Usage: python benchmark.py [benchmark ...]   (no arguments runs everything)
+Uses the same .env / DATABASE_URL detection as app.py
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+import app
+
+BENCH_TABLE = 'bench_data'
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+def make_frame(n_rows, seed=42):
+    """Build a mixed-type DataFrame resembling a typical uploaded dataset"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Age': rng.integers(18, 70, n_rows),
+        'Salary': rng.normal(55000, 15000, n_rows).round(2),
+        'Experience': rng.integers(0, 40, n_rows),
+        'Score': rng.random(n_rows),
+        'Gender': rng.choice(['Male', 'Female'], n_rows),
+        'City': rng.choice(['Delhi', 'Mumbai', 'Pune', 'Chennai', 'Kolkata'], n_rows),
+    })
+
+def timed(fn, *args, **kwargs):
+    """Run fn once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def print_header(title):
+    print()
+    print("=" * 70)
+    print(title)
+    print("=" * 70)
+
+def legacy_save_dataframe(df, table_name):
+    """The original one-INSERT-per-row loop, kept as the baseline"""
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    columns_sql = []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if dtype == 'int64':
+            sql_type = 'INTEGER' if app.DB_TYPE == 'postgresql' else 'INT'
+        elif dtype == 'float64':
+            sql_type = 'DOUBLE PRECISION' if app.DB_TYPE == 'postgresql' else 'DOUBLE'
+        else:
+            sql_type = 'TEXT'
+        columns_sql.append(f'{app.quote_identifier(col)} {sql_type}')
+    cursor.execute(f"CREATE TABLE {table_name} ({', '.join(columns_sql)})")
+    for _, row in df.iterrows():
+        placeholders = ', '.join(['%s'] * len(row))
+        columns = ', '.join(app.quote_identifier(col) for col in df.columns)
+        insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        cursor.execute(insert_sql, tuple(v.item() if hasattr(v, 'item') else v for v in row))
+    connection.commit()
+    cursor.close()
+    connection.close()
+    return True
+
+def bench_save_dataframe(sizes=DEFAULT_SIZES):
+    """Rows/sec of the bulk loader vs the legacy per-row INSERT loop"""
+    print_header(f"save_dataframe_to_db ({app.DB_TYPE}, batch size {app.DB_INSERT_BATCH_SIZE})")
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'bulk rows/s':>15} {'speedup':>10}")
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        _, legacy_s = timed(legacy_save_dataframe, df, BENCH_TABLE)
+        _, bulk_s = timed(app.save_dataframe_to_db, df, BENCH_TABLE)
+        print(f"{n_rows:>10,} {n_rows / legacy_s:>15,.0f} {n_rows / bulk_s:>15,.0f} "
+              f"{legacy_s / bulk_s:>9.1f}x")
+
+def bench_batch_predict(sizes=DEFAULT_SIZES, per_row_limit=10_000):
+    """Rows/sec of chunked batch scoring vs one predict() call per row (the old /predict loop)"""
+    from sklearn.linear_model import LinearRegression
+    print_header(f"batch prediction (chunk size {app.PREDICT_CHUNK_ROWS})")
+    train = make_frame(10_000)
+    features = ['Age', 'Experience', 'Score']
+    record = {'model': LinearRegression().fit(train[features], train['Salary']),
+              'feature_columns': features}
+    print(f"{'rows':>10} {'per-row rows/s':>15} {'csv rows/s':>15} {'ndjson rows/s':>15}")
+    for n_rows in sizes:
+        df = make_frame(n_rows)[features]
+        sample = df.head(per_row_limit)
+        _, per_row_s = timed(lambda: [record['model'].predict(sample.iloc[[i]]) for i in range(len(sample))])
+        rates = []
+        for output_format in ('csv', 'ndjson'):
+            chunks = app.iter_dataframe_batches(df, app.PREDICT_CHUNK_ROWS)
+            _, elapsed = timed(lambda: sum(len(text) for text in app.iter_batch_predictions(record, chunks, output_format)))
+            rates.append(n_rows / elapsed)
+        print(f"{n_rows:>10,} {len(sample) / per_row_s:>15,.0f} {rates[0]:>15,.0f} {rates[1]:>15,.0f}")
+
+def bench_aggregates(sizes=(1_000_000, 3_000_000)):
+    """Latency of value counts / summary pushed into the database vs a full pandas load"""
+    print_header(f"aggregate pushdown ({app.DB_TYPE})")
+    print(f"{'rows':>10} {'pandas counts':>14} {'sql counts':>12} {'pandas summary':>15} {'sql summary':>12}")
+    columns = ['Gender', 'City', 'Age']
+    for n_rows in sizes:
+        app.save_dataframe_to_db(make_frame(n_rows), BENCH_TABLE)
+        timings = []
+        for pushdown in (False, True):
+            app.AGGREGATE_PUSHDOWN = pushdown
+            app.dataframe_cache.invalidate(BENCH_TABLE)
+            _, counts_s = timed(app.run_aggregate, BENCH_TABLE,
+                                lambda connection, table_name, schema: app.pushdown_value_counts(connection, table_name, schema, columns),
+                                lambda df: app.value_counts_dataframe(df, columns))
+            app.dataframe_cache.invalidate(BENCH_TABLE)
+            _, summary_s = timed(app.run_aggregate, BENCH_TABLE, app.pushdown_summary, app.summarize_dataframe)
+            timings += [counts_s, summary_s]
+        print(f"{n_rows:>10,} {timings[0]:>13.2f}s {timings[2]:>11.2f}s {timings[1]:>14.2f}s {timings[3]:>11.2f}s")
+
+def bench_boxplot(sizes=DEFAULT_SIZES + (5_000_000,)):
+    """Render time of DataFrame.boxplot on raw rows vs Axes.bxp from precomputed statistics"""
+    import io
+    import matplotlib.pyplot as plt
+    print_header(f"outlier boxplot rendering (max fliers {app.BOXPLOT_MAX_FLIERS})")
+    print(f"{'rows':>10} {'raw rows s':>12} {'bxp s':>10} {'speedup':>10}")
+    columns = ['Age', 'Salary', 'Experience', 'Score']
+    
+    def render(draw):
+        fig = draw()
+        fig.savefig(io.BytesIO(), format='png', dpi=100, bbox_inches='tight')
+        plt.close(fig)
+    
+    def draw_raw(df):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        df[columns].boxplot(ax=ax)
+        fig.tight_layout()
+        return fig
+    
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        _, raw_s = timed(render, lambda: draw_raw(df))
+        _, bxp_s = timed(render, lambda: app.draw_outlier_boxplot(app.boxplot_stats(df, columns)))
+        print(f"{n_rows:>10,} {raw_s:>12.2f} {bxp_s:>10.2f} {raw_s / bxp_s:>9.1f}x")
+
+PIPELINE_SESSION = [
+    ('handle_missing', {'method': 'mean'}),
+    ('handle_outliers', {'columns': ['Salary'], 'method': 'capping'}),
+    ('encode_data', {'columns': ['Gender', 'City'], 'method': 'label'}),
+    ('scale_data', {'columns': ['Age', 'Experience'], 'method': 'standard'}),
+]
+
+def bench_pipeline(sizes=DEFAULT_SIZES):
+    """Total I/O of a four-step preprocessing session: rewrite per step vs recorded pipeline"""
+    print_header(f"four-step preprocessing session ({app.DB_TYPE})")
+    print(f"{'rows':>10} {'rewrite rows r/w':>20} {'rewrite s':>10} {'pipeline rows r/w':>20} {'pipeline s':>11}")
+    for n_rows in sizes:
+        app.save_dataframe_to_db(make_frame(n_rows), BENCH_TABLE)
+        
+        # The old routes: load, transform, drop and rewrite the table for every step
+        def rewrite_each_step():
+            read = written = 0
+            for op, params in PIPELINE_SESSION:
+                df = app.load_dataframe_from_db(BENCH_TABLE)
+                read += len(df)
+                df = app.make_transformer({'op': op, 'params': params}).fit_apply(df)
+                app.save_dataframe_to_db(df, BENCH_TABLE)
+                written += len(df)
+            return read, written
+        
+        # Recorded steps replayed on one load; nothing is written back
+        def replay_steps():
+            steps = [{'op': op, 'params': params} for op, params in PIPELINE_SESSION]
+            df = app.load_processed_dataframe(BENCH_TABLE, steps)
+            return len(df), 0
+        
+        app.dataframe_cache.invalidate(BENCH_TABLE)
+        (old_read, old_written), old_s = timed(rewrite_each_step)
+        app.save_dataframe_to_db(make_frame(n_rows), BENCH_TABLE)
+        app.dataframe_cache.invalidate(BENCH_TABLE)
+        (new_read, new_written), new_s = timed(replay_steps)
+        print(f"{n_rows:>10,} {f'{old_read:,}/{old_written:,}':>20} {old_s:>10.2f} "
+              f"{f'{new_read:,}/{new_written:,}':>20} {new_s:>11.2f}")
+
+def legacy_handle_outliers(df, columns, method):
+    """The original per-column loop: two quantile calls per column, one re-filter per column when trimming"""
+    df = df.copy()
+    for col in columns:
+        Q1 = df[col].quantile(0.25)
+        Q3 = df[col].quantile(0.75)
+        IQR = Q3 - Q1
+        lower_bound, upper_bound = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+        if method == 'capping':
+            df[col] = df[col].clip(lower_bound, upper_bound)
+        else:
+            df = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
+    return df
+
+def bench_outliers(n_rows=1_000_000, column_counts=(1, 5, 20, 50)):
+    """Outlier handling time: per-column loop vs one vectorized pass, across column counts and rules"""
+    from preprocessors import OutlierClipper, OUTLIER_RULES
+    print_header(f"outlier handling ({n_rows:,} rows)")
+    rng = np.random.default_rng(42)
+    wide = pd.DataFrame(rng.standard_t(3, size=(n_rows, max(column_counts))),
+                        columns=[f'x{i}' for i in range(max(column_counts))])
+    print(f"{'columns':>8} {'method':>9} {'loop s':>8} " + ' '.join(f'{rule + " s":>12}' for rule in OUTLIER_RULES))
+    for n_columns in column_counts:
+        columns = list(wide.columns[:n_columns])
+        for method in ('capping', 'trimming'):
+            _, loop_s = timed(legacy_handle_outliers, wide, columns, method)
+            rule_s = [timed(OutlierClipper(columns, method, rule).fit_apply, wide)[1] for rule in OUTLIER_RULES]
+            print(f"{n_columns:>8} {method:>9} {loop_s:>8.2f} " + ' '.join(f'{s:>12.2f}' for s in rule_s))
+
+def bench_compare(sizes=(100_000, 1_000_000)):
+    """Wall time of the cross-validated model comparison on one core vs. CV_JOBS cores"""
+    import joblib
+    print_header(f"model comparison ({app.CV_FOLDS} folds, {sum(map(len, app.MODEL_GRIDS.values()))} candidates)")
+    print(f"{'rows':>10} {'1 job s':>10} {f'{joblib.effective_n_jobs(app.CV_JOBS)} jobs s':>10} {'speedup':>10}")
+    default_jobs = app.CV_JOBS
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+        df['Gender'] = (df['Gender'] == 'Male').astype(int)
+        app.save_dataframe_to_db(df.drop(columns=['City']), BENCH_TABLE)
+        timings = []
+        for n_jobs in (1, default_jobs):
+            app.CV_JOBS = n_jobs
+            _, elapsed = timed(app.compare_models_task, BENCH_TABLE, 'Gender')
+            timings.append(elapsed)
+        app.CV_JOBS = default_jobs
+        print(f"{n_rows:>10,} {timings[0]:>10.2f} {timings[1]:>10.2f} {timings[0] / timings[1]:>9.1f}x")
+
+def bench_incremental(sizes=(100_000, 1_000_000)):
+    """Wall time and peak Python heap of in-memory training vs. out-of-core SGD training"""
+    import tracemalloc
+    print_header(f"incremental training (chunk {app.INCREMENTAL_CHUNK_ROWS:,} rows, {app.INCREMENTAL_EPOCHS} epochs)")
+    print(f"{'rows':>10} {'in-memory s':>12} {'peak MB':>9} {'incremental s':>14} {'peak MB':>9}")
+    
+    def measure(fn, *args, **kwargs):
+        tracemalloc.start()
+        _, elapsed = timed(fn, *args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak / 1e6
+    
+    for n_rows in sizes:
+        app.save_dataframe_to_db(make_frame(n_rows).drop(columns=['Gender', 'City']), BENCH_TABLE)
+        app.dataframe_cache.invalidate(BENCH_TABLE)
+        full_s, full_mb = measure(app.training_task, BENCH_TABLE, 'ridge', 'Salary', 0.2, 42)
+        app.dataframe_cache.invalidate(BENCH_TABLE)
+        inc_s, inc_mb = measure(app.incremental_training_task, BENCH_TABLE, 'ridge', 'Salary', 0.2, 42)
+        print(f"{n_rows:>10,} {full_s:>12.2f} {full_mb:>9.1f} {inc_s:>14.2f} {inc_mb:>9.1f}")
+
+def bench_linear_scorer(batch_sizes=(1, 100, 10_000, 1_000_000), repeats=2000):
+    """Latency of the sklearn Pipeline path vs. the compiled NumPy scorer, single rows and batches"""
+    from sklearn.pipeline import Pipeline
+    from linear_scorer import compile_linear_scorer
+    print_header("linear model inference (4-step preprocessing + Ridge)")
+    train = make_frame(100_000)
+    steps = [{'op': op, 'params': params} for op, params in PIPELINE_SESSION]
+    transformers = []
+    for i, step in enumerate(steps):
+        transformer = app.make_transformer(step)
+        train = transformer.fit_apply(train)
+        transformers.append((f"{i}_{step['op']}", transformer))
+    features = [col for col in train.columns if col != 'Score']
+    model = Pipeline(transformers + [('model', app.build_model('ridge').fit(train[features], train['Score']))])
+    scorer = compile_linear_scorer(model, features)
+    
+    # Single rows as /predict receives them: a JSON dict of raw values
+    row = make_frame(1).iloc[0][features].to_dict()
+    _, sklearn_s = timed(lambda: [model.predict(pd.DataFrame([row])[features]) for _ in range(repeats)])
+    _, numpy_s = timed(lambda: [scorer.predict_one(row) for _ in range(repeats)])
+    print(f"single row: sklearn {sklearn_s / repeats * 1e6:,.0f} us, numpy {numpy_s / repeats * 1e6:,.1f} us "
+          f"({sklearn_s / numpy_s:.0f}x)")
+    
+    print(f"{'rows':>10} {'sklearn rows/s':>16} {'numpy rows/s':>14} {'speedup':>10}")
+    for n_rows in batch_sizes:
+        df = make_frame(n_rows)[features]
+        _, sklearn_s = timed(model.predict, df)
+        _, numpy_s = timed(scorer.predict, df)
+        print(f"{n_rows:>10,} {n_rows / sklearn_s:>16,.0f} {n_rows / numpy_s:>14,.0f} {sklearn_s / numpy_s:>9.1f}x")
+
+def bench_storage(sizes=DEFAULT_SIZES, fmt='arrow'):
+    """Save, full load and two-column load: SQL tables vs. memory-mapped columnar files"""
+    import tempfile
+    print_header(f"dataset storage ({app.DB_TYPE} vs. {fmt} files)")
+    print(f"{'rows':>10} {'backend':>10} {'save s':>8} {'load s':>8} {'2 columns s':>12}")
+    default_storage = app.DATASET_STORAGE
+    with tempfile.TemporaryDirectory() as directory:
+        app.DATASET_DIR, app._dataset_store = directory, None
+        for n_rows in sizes:
+            df = make_frame(n_rows)
+            for storage in ('sql', fmt):
+                app.DATASET_STORAGE = storage
+                _, save_s = timed(app.save_dataframe_to_db, df, BENCH_TABLE)
+                app.dataframe_cache.invalidate(BENCH_TABLE)
+                _, load_s = timed(app.load_versioned_dataframe, BENCH_TABLE)
+                app.dataframe_cache.invalidate(BENCH_TABLE)
+                _, project_s = timed(app.load_versioned_dataframe, BENCH_TABLE, ['City', 'Salary'])
+                print(f"{n_rows:>10,} {storage:>10} {save_s:>8.2f} {load_s:>8.3f} {project_s:>12.3f}")
+    app.DATASET_STORAGE, app._dataset_store = default_storage, None
+
+STARTUP_SCRIPT = '''
+import json, os, sys, time
+start = time.perf_counter()
+import app
+result = {'import_s': time.perf_counter() - start}
+client = app.app.test_client()
+start = time.perf_counter()
+client.get('/')
+result['first_page_s'] = time.perf_counter() - start
+if sys.argv[1] == 'preload':
+    start = time.perf_counter()
+    app.preload_dependencies()
+    result['preload_s'] = time.perf_counter() - start
+
+def private_mb():
+    with open('/proc/self/smaps_rollup') as f:
+        fields = dict(line.split(':', 1) for line in f if ':' in line)
+    return sum(int(fields[key].split()[0]) for key in ('Private_Clean', 'Private_Dirty')) / 1024
+
+# A forked "worker" that ends up with every dependency loaded, as a busy worker does
+read_fd, write_fd = os.pipe()
+if os.fork() == 0:
+    app.preload_dependencies()
+    os.write(write_fd, str(private_mb()).encode())
+    os._exit(0)
+os.wait()
+result['worker_private_mb'] = float(os.read(read_fd, 64))
+print(json.dumps(result))
+'''
+
+def bench_startup():
+    """Import time, first request latency and per-worker private memory: lazy imports vs. preload"""
+    import json
+    import os
+    import subprocess
+    print_header("worker startup")
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("Needs Linux /proc/<pid>/smaps_rollup for the memory figures")
+        return
+    print(f"{'mode':>10} {'import s':>10} {'first page s':>13} {'preload s':>10} {'worker private MB':>18}")
+    for mode in ('lazy', 'preload'):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, mode], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        preload = f"{result['preload_s']:.2f}" if 'preload_s' in result else '-'
+        print(f"{mode:>10} {result['import_s']:>10.2f} {result['first_page_s']:>13.3f} "
+              f"{preload:>10} {result['worker_private_mb']:>18.1f}")
+
+BENCHMARKS = {
+    'save': bench_save_dataframe,
+    'predict_batch': bench_batch_predict,
+    'aggregates': bench_aggregates,
+    'boxplot': bench_boxplot,
+    'pipeline': bench_pipeline,
+    'outliers': bench_outliers,
+    'compare': bench_compare,
+    'incremental': bench_incremental,
+    'linear_scorer': bench_linear_scorer,
+    'startup': bench_startup,
+    'storage': bench_storage,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}")
+        print(f"Available: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    for name in names:
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Columnar Dataset Store
+Datasets kept as Arrow IPC (or Parquet) files on local disk instead of SQL tables
+Every save writes a complete new version directory and publishes it with a single rename;
+loads memory-map the newest version and read only the requested columns
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+# Arrow type of each storage kind (the same kinds app.py records for SQL tables)
+ARROW_TYPES = {
+    'bool': pa.bool_(),
+    'int16': pa.int16(),
+    'int32': pa.int32(),
+    'int64': pa.int64(),
+    'float': pa.float64(),
+    'datetime': pa.timestamp('us'),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'text': pa.string(),
+}
+
+FILE_SUFFIXES = {'arrow': '.arrow', 'parquet': '.parquet'}
+MANIFEST = 'manifest.json'
+# Staging directories untouched this long (beyond the retention) belong to crashed writers
+STAGING_MAX_AGE = 3600
+
+
+def text_array(series):
+    """Arrow strings for a pandas column, stringifying mixed-type object columns"""
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        return pa.array(series.map(str, na_action='ignore'), type=pa.string(), from_pandas=True)
+
+
+def to_arrow(chunk, schema):
+    """Arrow table of a DataFrame chunk with every column converted to its kind's type"""
+    arrays = []
+    for col, kind in schema.items():
+        if kind in ('text', 'category'):
+            array = text_array(chunk[col])
+            arrays.append(array.dictionary_encode() if kind == 'category' else array)
+        else:
+            arrays.append(pa.array(chunk[col], type=ARROW_TYPES[kind], from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in schema])
+
+
+def cast_table(table, schema):
+    """Cast a stored part to a (widened) schema"""
+    columns = []
+    for col, kind in schema.items():
+        column = table.column(col)
+        if column.type == ARROW_TYPES[kind]:
+            columns.append(column)
+        elif kind == 'category':
+            columns.append(pc.dictionary_encode(column.cast(pa.string())))
+        else:
+            columns.append(column.cast(ARROW_TYPES[kind]))
+    return pa.Table.from_arrays(columns, names=list(schema))
+
+
+class ColumnarStore:
+    """Versioned datasets under `directory`/<table name>/v<version>/.
+
+    A version directory holds one file per saved chunk plus a manifest with the schema and
+    row count. Readers list the table directory and open the newest complete version, so
+    they never see a partial write. A replaced version stays on disk for `retention`
+    seconds, so readers that listed it just before a save can still open it, and is
+    removed by the next commit() or collect() after that (open memory maps stay valid
+    after the files are unlinked).
+    """
+
+    def __init__(self, directory, fmt='arrow', category_max_unique_ratio=0.5, retention=300):
+        if fmt not in FILE_SUFFIXES:
+            raise ValueError(f'Unsupported dataset file format: {fmt}')
+        self.directory = directory
+        self.fmt = fmt
+        self.category_max_unique_ratio = category_max_unique_ratio
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+
+    def _table_dir(self, table_name):
+        return os.path.join(self.directory, table_name)
+
+    def _version_dir(self, table_name, version):
+        return os.path.join(self._table_dir(table_name), f'v{version}')
+
+    def versions(self, table_name):
+        """Published versions of a table, oldest first"""
+        try:
+            names = os.listdir(self._table_dir(table_name))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        return sorted(int(name[1:]) for name in names if name.startswith('v') and name[1:].isdigit())
+
+    def version(self, table_name):
+        """Newest published version of a table, or None if it has never been saved"""
+        versions = self.versions(table_name)
+        return versions[-1] if versions else None
+
+    def manifest(self, table_name, version=None):
+        """Schema, row count and part files of a version (the newest by default), or None"""
+        version = self.version(table_name) if version is None else version
+        if version is None:
+            return None
+        try:
+            with open(os.path.join(self._version_dir(table_name, version), MANIFEST)) as f:
+                return dict(json.load(f), version=version)
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, table, path):
+        if self.fmt == 'parquet':
+            pq.write_table(table, path)
+        else:
+            # Uncompressed IPC, so a memory-mapped read needs no decoding and no copies
+            with ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+
+    def _read_file(self, path, columns=None):
+        if self.fmt == 'parquet':
+            return pq.read_table(path, columns=columns, memory_map=True)
+        table = ipc.open_file(pa.memory_map(path)).read_all()
+        return table if columns is None else table.select(columns)
+
+    def _read_version(self, table_name, columns):
+        manifest = self.manifest(table_name)
+        if manifest is None:
+            return None, None
+        if columns is not None:
+            columns = [str(col) for col in columns if str(col) in manifest['schema']]
+        version_dir = self._version_dir(table_name, manifest['version'])
+        parts = [self._read_file(os.path.join(version_dir, part), columns) for part in manifest['parts']]
+        return parts, manifest
+
+    def _retrying(self, read):
+        # A writer may remove the version a reader just listed; the next listing finds its successor
+        for attempt in range(3):
+            try:
+                return read()
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def read(self, table_name, columns=None):
+        """Memory-map the newest version as one Arrow table (only `columns` if given).
+
+        Returns (table, manifest), or (None, None) if the table does not exist.
+        """
+        parts, manifest = self._retrying(lambda: self._read_version(table_name, columns))
+        if parts is None:
+            return None, None
+        return pa.concat_tables(parts), manifest
+
+    def iter_batches(self, table_name, chunk_rows, columns=None):
+        """Yield record batches of at most chunk_rows rows from the newest version"""
+        parts, _ = self._retrying(lambda: self._read_version(table_name, columns))
+        if parts is None:
+            raise FileNotFoundError(f'No stored dataset named {table_name}')
+        for part in parts:
+            yield from part.to_batches(max_chunksize=chunk_rows)
+
+    def collect(self, table_name=None, retention=None):
+        """Remove versions replaced more than `retention` seconds ago (all tables by default).
+
+        Versions are publish times in nanoseconds, so a version was replaced when its
+        successor was published. Abandoned staging directories are removed too.
+        Returns the number of directories removed.
+        """
+        retention = self.retention if retention is None else retention
+        cutoff = time.time_ns() - int(retention * 1e9)
+        tables = [table_name] if table_name is not None else os.listdir(self.directory)
+        removed = 0
+        for table in tables:
+            versions = self.versions(table)
+            for old, successor in zip(versions, versions[1:]):
+                if successor <= cutoff:
+                    shutil.rmtree(self._version_dir(table, old), ignore_errors=True)
+                    removed += 1
+            try:
+                names = os.listdir(self._table_dir(table))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for name in names:
+                path = os.path.join(self._table_dir(table), name)
+                if name.startswith('.staging-') and os.path.getmtime(path) <= cutoff / 1e9 - STAGING_MAX_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def tables(self):
+        """Names of the stored tables"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if not name.startswith('.') and os.path.isdir(self._table_dir(name)))
+
+    def size(self, table_name, version=None):
+        """Bytes on disk of a table's version (all its versions by default)"""
+        versions = self.versions(table_name) if version is None else [version]
+        total = 0
+        for v in versions:
+            for root, _, files in os.walk(self._version_dir(table_name, v)):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    def writer(self, table_name):
+        return DatasetWriter(self, table_name)
+
+    def drop(self, table_name):
+        shutil.rmtree(self._table_dir(table_name), ignore_errors=True)
+
+
+class DatasetWriter:
+    """Writes one new version of a table chunk by chunk into a private staging directory.
+
+    Nothing is visible to readers until commit() renames the staging directory into place;
+    abort() (or an exception inside a `with` block) discards it.
+    """
+
+    def __init__(self, store, table_name):
+        self.store = store
+        self.table_name = table_name
+        self.staging = os.path.join(store._table_dir(table_name), f'.staging-{uuid.uuid4().hex}')
+        os.makedirs(self.staging)
+        self.parts = []  # (file name, {column: kind} it was written with)
+        self.rows = 0
+
+    def write(self, chunk, schema):
+        """Append a chunk converted to the kinds inferred so far"""
+        name = f'part-{len(self.parts):05d}{FILE_SUFFIXES[self.store.fmt]}'
+        self.store._write_file(to_arrow(chunk, schema), os.path.join(self.staging, name))
+        self.parts.append((name, dict(schema)))
+        self.rows += len(chunk)
+
+    def _low_cardinality(self, col):
+        """True if a text column has few enough distinct values to store dictionary-encoded"""
+        limit = self.store.category_max_unique_ratio * self.rows
+        seen = set()
+        for name, _ in self.parts:
+            table = self.store._read_file(os.path.join(self.staging, name), [str(col)])
+            seen.update(pc.unique(table.column(0).cast(pa.string())).to_pylist())
+            seen.discard(None)
+            if len(seen) > limit:
+                return False
+        return bool(self.rows)
+
+    def commit(self, schema):
+        """Bring earlier parts up to the final (widened) schema and publish the version.
+
+        Low-cardinality text columns are dictionary-encoded, so they load as categoricals.
+        Returns the published version.
+        """
+        schema = {str(col): kind for col, kind in schema.items()}
+        for col, kind in schema.items():
+            if kind == 'text' and self._low_cardinality(col):
+                schema[col] = 'category'
+        for name, written in self.parts:
+            if written != schema:
+                path = os.path.join(self.staging, name)
+                table = cast_table(self.store._read_file(path), schema)
+                self.store._write_file(table, path + '.tmp')
+                os.replace(path + '.tmp', path)
+
+        manifest = {'format': self.store.fmt, 'schema': schema, 'rows': self.rows,
+                    'parts': [name for name, _ in self.parts], 'saved_at': time.time()}
+        with open(os.path.join(self.staging, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+        # Versions are timestamps, so a dropped and re-created table never reuses one
+        version = max(time.time_ns(), (self.store.version(self.table_name) or 0) + 1)
+        while True:
+            try:
+                os.rename(self.staging, self.store._version_dir(self.table_name, version))
+                break
+            except OSError:
+                if not os.path.isdir(self.store._version_dir(self.table_name, version)):
+                    raise
+                version += 1
+        self.store.collect(self.table_name)
+        return version
+
+    def abort(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or os.path.isdir(self.staging):
+            self.abort()
+        return False
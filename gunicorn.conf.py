@@ -0,0 +1,22 @@
+"""
+Gunicorn Configuration
+Picked up automatically by `gunicorn app:app` (see Procfile) when run from this directory
+With preload_app the master imports the app and its heavy dependencies once, and the forked
+workers share those pages copy-on-write instead of each importing them after boot
+"""
+
+import gc
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+
+def when_ready(server):
+    """Runs in the master before the first worker is forked"""
+    if not preload_app:
+        return
+    import app
+    app.preload_dependencies()
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in workers
+    gc.freeze()
+    server.log.info("Preloaded app dependencies for copy-on-write sharing")
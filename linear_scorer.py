@@ -0,0 +1,198 @@
+"""
+Linear Scorer
+NumPy inference for the app's linear models without pandas or sklearn validation
+A stored Pipeline (preprocessing steps + linear estimator) is compiled once per worker into
+per-feature arrays, so scoring a row is a handful of vectorized array ops and one X @ coef
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+
+from preprocessors import MissingValueFiller, OutlierClipper, CategoryEncoder, ColumnScaler
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class LinearScorer:
+    """Score rows with a compiled linear model.
+
+    Features are held as one float matrix in feature order. Text columns are label-encoded
+    with dict lookups, then the fills, clips and scalers the pipeline applies are replayed
+    as per-column array ops. Trailing scalers are folded into the coefficients, so most
+    models end in a single `X @ coef + intercept`.
+    """
+
+    def __init__(self, columns, encoders, ops, coef, intercept, classes=None, multinomial=True):
+        self.columns = list(columns)
+        self.encoders = encoders          # {feature index: (classes, {class: code}, fill value or None)}
+        self.ops = ops                    # [('fill', values) | ('clip', lower, upper) | ('affine', mult, add)]
+        self.coef = np.ascontiguousarray(coef, dtype=float)
+        self.intercept = np.asarray(intercept, dtype=float)
+        self.classes = classes
+        self.multinomial = multinomial
+
+    def _features_from_values(self, values):
+        """One-row feature matrix from a {column: value} dict"""
+        row = np.empty((1, len(self.columns)))
+        for i, col in enumerate(self.columns):
+            value = values[col]
+            encoder = self.encoders.get(i)
+            if encoder is not None:
+                _, codes, fill = encoder
+                if is_missing(value) and fill is not None:
+                    value = fill
+                row[0, i] = -1 if is_missing(value) else codes.get(str(value), -1)
+            else:
+                row[0, i] = np.nan if is_missing(value) else float(value)
+        return row
+
+    def _features_from_frame(self, df):
+        """Feature matrix from a DataFrame, encoding text columns to the same codes as CategoryEncoder"""
+        X = np.empty((len(df), len(self.columns)))
+        for i, col in enumerate(self.columns):
+            encoder = self.encoders.get(i)
+            if encoder is not None:
+                _, codes, fill = encoder
+                series = df[col] if fill is None else df[col].fillna(fill)
+                # Look up each distinct value once; the trailing -1 catches missing values (code -1)
+                positions, uniques = pd.factorize(series.astype(str))
+                X[:, i] = np.array([codes.get(value, -1) for value in uniques] + [-1])[positions]
+            else:
+                X[:, i] = pd.to_numeric(df[col]).to_numpy(dtype=float)
+        return X
+
+    def decision_function(self, X):
+        for op in self.ops:
+            if op[0] == 'fill':
+                X = np.where(np.isnan(X), op[1], X)
+            elif op[0] == 'clip':
+                X = np.clip(X, op[1], op[2])
+            else:
+                X = X * op[1] + op[2]
+        return X @ self.coef + self.intercept
+
+    def _predict(self, X):
+        scores = self.decision_function(X)
+        if self.classes is None:
+            return scores
+        if scores.shape[1] == 1:
+            return self.classes[(scores[:, 0] > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
+    def _predict_proba(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            positive = 1 / (1 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - positive, positive])
+        if self.multinomial:
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        else:
+            # One-vs-rest classifiers normalize the per-class sigmoids
+            scores = 1 / (1 + np.exp(-scores))
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict_one(self, values):
+        """Prediction for a single {column: value} row"""
+        return self._predict(self._features_from_values(values))[0]
+
+    def predict(self, df):
+        """Predictions for every row of a DataFrame holding the feature columns"""
+        return self._predict(self._features_from_frame(df))
+
+    def predict_proba(self, df):
+        """Class probabilities (sigmoid for binary, softmax or normalized one-vs-rest otherwise)"""
+        if self.classes is None:
+            raise AttributeError('Regression models have no predict_proba')
+        return self._predict_proba(self._features_from_frame(df))
+
+
+def compile_linear_scorer(model, feature_columns):
+    """Compile a stored model into a LinearScorer, or return None if it cannot be expressed.
+
+    Supported: Pipelines of the app's preprocessing steps and an optional StandardScaler
+    ending in any estimator with coef_/intercept_. Columns clipped or scaled before they
+    are label-encoded fall back to the sklearn path.
+    """
+    steps = [step for _, step in model.steps[:-1]] if isinstance(model, Pipeline) else []
+    estimator = model.steps[-1][1] if isinstance(model, Pipeline) else model
+    if not hasattr(estimator, 'coef_') or not hasattr(estimator, 'intercept_'):
+        return None
+
+    columns = list(feature_columns)
+    index = {col: i for i, col in enumerate(columns)}
+    n = len(columns)
+    to_encode = {index[col] for step in steps if isinstance(step, CategoryEncoder)
+                 for col in step.classes_ if col in index}
+    encoders, pre_fills, ops = {}, {}, []
+    for step in steps:
+        if isinstance(step, MissingValueFiller):
+            fill = np.full(n, np.nan)
+            for col, value in step.fill_values_.items():
+                i = index.get(col)
+                if i is None or i in encoders:
+                    # Encoded columns hold codes, never missing values
+                    continue
+                if i in to_encode:
+                    # Filled before being encoded: the fill applies to the raw value
+                    pre_fills.setdefault(i, value)
+                    continue
+                try:
+                    fill[i] = float(value)
+                except (TypeError, ValueError):
+                    return None
+            if not np.isnan(fill).all():
+                ops.append(('fill', fill))
+        elif isinstance(step, CategoryEncoder):
+            for col, classes in step.classes_.items():
+                i = index.get(col)
+                if i is None:
+                    continue
+                if i in encoders:
+                    return None
+                encoders[i] = (classes, {cls: code for code, cls in enumerate(classes)}, pre_fills.get(i))
+        elif isinstance(step, (OutlierClipper, ColumnScaler)):
+            if isinstance(step, OutlierClipper) and step.method != 'capping':
+                continue
+            fitted = step.lower_ if isinstance(step, OutlierClipper) else step.params_
+            if any(index[col] in to_encode and index[col] not in encoders for col in fitted if col in index):
+                return None
+            if isinstance(step, OutlierClipper):
+                lower, upper = np.full(n, -np.inf), np.full(n, np.inf)
+                for col in fitted:
+                    if col in index:
+                        lower[index[col]], upper[index[col]] = step.lower_[col], step.upper_[col]
+                ops.append(('clip', lower, upper))
+            else:
+                mult, add = np.ones(n), np.zeros(n)
+                for col, (first, second) in fitted.items():
+                    if col not in index:
+                        continue
+                    if step.method == 'standard':
+                        mult[index[col]], add[index[col]] = 1 / second, -first / second
+                    else:
+                        mult[index[col]], add[index[col]] = first, second
+                ops.append(('affine', mult, add))
+        elif isinstance(step, StandardScaler):
+            mean = step.mean_ if step.with_mean else np.zeros(n)
+            scale = step.scale_ if step.with_std else np.ones(n)
+            ops.append(('affine', 1 / scale, -mean / scale))
+        else:
+            return None
+
+    # Fold trailing affine ops into the coefficients: (X * a + b) @ W = X @ (a * W) + b @ W
+    coef = np.asarray(estimator.coef_, dtype=float).T
+    intercept = np.asarray(estimator.intercept_, dtype=float)
+    if coef.ndim == 1:
+        intercept = float(intercept.reshape(-1)[0])
+    while ops and ops[-1][0] == 'affine':
+        _, mult, add = ops.pop()
+        intercept = intercept + add @ coef
+        coef = coef * (mult if coef.ndim == 1 else mult[:, None])
+
+    return LinearScorer(columns, encoders, ops, coef, intercept, classes=getattr(estimator, 'classes_', None),
+                        multinomial=isinstance(estimator, LogisticRegression))
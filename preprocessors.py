@@ -0,0 +1,239 @@
+"""
+Preprocessing Transformers
+Fitted versions of the preprocessing steps offered by the app
+A trained model is saved as one sklearn Pipeline of these steps plus the estimator, so
+/predict applies exactly the preprocessing the model was trained on
+Kept out of app.py so pickled pipelines load the same under `python app.py` and gunicorn
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+
+
+def is_numeric_column(series):
+    """True for int/float columns of any width (bools excluded)"""
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+class PreprocessingStep(BaseEstimator, TransformerMixin):
+    """Base class for the app's preprocessing steps.
+
+    fit() learns from the training data and transform() maps rows independently, so a
+    fitted step can score single rows. transform_training() is what the training data goes
+    through; steps that remove rows (dropping missing values, trimming outliers) only do so
+    there, never at prediction time. Steps whose statistics can be accumulated exactly over
+    chunks also implement partial_fit() for out-of-core training.
+    """
+
+    def transform_training(self, X):
+        return self.transform(X)
+
+    def fit_apply(self, X):
+        return self.fit(X).transform_training(X)
+
+    def can_partial_fit(self):
+        return False
+
+    def __sklearn_is_fitted__(self):
+        return hasattr(self, 'fitted_')
+
+
+class MissingValueFiller(PreprocessingStep):
+    """Fill missing values with the training mean, median or mode, or drop incomplete rows"""
+
+    def __init__(self, method='mean'):
+        self.method = method
+
+    def fit(self, X, y=None):
+        self.fill_values_ = {}
+        if self.method in ('mean', 'median'):
+            numeric = X.select_dtypes(include=[np.number])
+            stats = numeric.mean() if self.method == 'mean' else numeric.median()
+            self.fill_values_ = stats.dropna().to_dict()
+        elif self.method == 'mode':
+            for col in X.columns:
+                if X[col].isna().any():
+                    mode_val = X[col].mode()
+                    if len(mode_val) > 0:
+                        self.fill_values_[col] = mode_val[0]
+        self.fitted_ = True
+        return self
+
+    def can_partial_fit(self):
+        return self.method in ('mean', 'drop')
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, 'sums_'):
+            self.sums_, self.counts_ = {}, {}
+        if self.method == 'mean':
+            numeric = X.select_dtypes(include=[np.number])
+            for col, total in numeric.sum().items():
+                self.sums_[col] = self.sums_.get(col, 0.0) + float(total)
+            for col, count in numeric.count().items():
+                self.counts_[col] = self.counts_.get(col, 0) + int(count)
+        self.fill_values_ = {col: total / self.counts_[col] for col, total in self.sums_.items() if self.counts_[col]}
+        self.fitted_ = True
+        return self
+
+    def transform(self, X):
+        values = {col: value for col, value in self.fill_values_.items() if col in X.columns}
+        return X.fillna(values) if values else X
+
+    def transform_training(self, X):
+        return X.dropna() if self.method == 'drop' else self.transform(X)
+
+
+# Outlier fences: 'iqr' = quartiles -/+ 1.5 IQR, 'zscore' = mean -/+ 3 std,
+# 'mad' = median -/+ 3.5 robust std (1.4826 * MAD), 'percentile' = 1st/99th percentiles
+OUTLIER_RULES = ('iqr', 'zscore', 'mad', 'percentile')
+IQR_FACTOR = 1.5
+ZSCORE_THRESHOLD = 3.0
+MAD_THRESHOLD = 3.5
+PERCENTILE_CAPS = (0.01, 0.99)
+
+
+class OutlierClipper(PreprocessingStep):
+    """Cap values to fences fitted on the training data, or trim rows outside them from it.
+
+    Fences for all columns are computed in one vectorized pass, capping is a single
+    broadcasted clip and trimming applies one combined row mask.
+    """
+
+    def __init__(self, columns=(), method='capping', rule='iqr'):
+        self.columns = columns
+        self.method = method
+        self.rule = rule
+
+    def fit(self, X, y=None):
+        if self.rule not in OUTLIER_RULES:
+            raise ValueError(f'Unknown outlier rule: {self.rule}')
+        numeric = [col for col in self.columns if col in X.columns and is_numeric_column(X[col])]
+        values = X[numeric].astype(float)
+        if self.rule == 'iqr':
+            quartiles = values.quantile([0.25, 0.75])
+            q1, q3 = quartiles.iloc[0], quartiles.iloc[1]
+            lower, upper = q1 - IQR_FACTOR * (q3 - q1), q3 + IQR_FACTOR * (q3 - q1)
+        elif self.rule == 'zscore':
+            mean, std = values.mean(), values.std()
+            lower, upper = mean - ZSCORE_THRESHOLD * std, mean + ZSCORE_THRESHOLD * std
+        elif self.rule == 'mad':
+            median = values.median()
+            spread = MAD_THRESHOLD * 1.4826 * (values - median).abs().median()
+            lower, upper = median - spread, median + spread
+        else:
+            caps = values.quantile(list(PERCENTILE_CAPS))
+            lower, upper = caps.iloc[0], caps.iloc[1]
+        self.lower_ = lower.to_dict()
+        self.upper_ = upper.to_dict()
+        self.fitted_ = True
+        return self
+
+    def _fences(self, X):
+        """Columns of X that have fences, with their lower and upper fences as arrays"""
+        columns = [col for col in self.lower_ if col in X.columns]
+        lower = np.array([self.lower_[col] for col in columns], dtype=float)
+        upper = np.array([self.upper_[col] for col in columns], dtype=float)
+        return columns, lower, upper
+
+    def transform(self, X):
+        if self.method != 'capping':
+            return X
+        columns, lower, upper = self._fences(X)
+        if not columns:
+            return X
+        X = X.copy()
+        # Winsorizing
+        X[columns] = np.clip(X[columns].to_numpy(dtype=float), lower, upper)
+        return X
+
+    def transform_training(self, X):
+        if self.method != 'trimming':
+            return self.transform(X)
+        columns, lower, upper = self._fences(X)
+        if not columns:
+            return X
+        # Remove rows with an outlier (or a missing value) in any selected column
+        values = X[columns].to_numpy(dtype=float)
+        return X[((values >= lower) & (values <= upper)).all(axis=1)]
+
+
+class CategoryEncoder(PreprocessingStep):
+    """Label-encode columns with the sorted training categories; unseen values become -1"""
+
+    def __init__(self, columns=(), method='label'):
+        self.columns = columns
+        self.method = method
+
+    def fit(self, X, y=None):
+        self.classes_ = {col: sorted(X[col].astype(str).dropna().unique())
+                         for col in self.columns if col in X.columns}
+        self.fitted_ = True
+        return self
+
+    def can_partial_fit(self):
+        return True
+
+    def partial_fit(self, X, y=None):
+        classes = getattr(self, 'classes_', {})
+        self.classes_ = {col: sorted(set(classes.get(col, ())).union(X[col].astype(str).dropna().unique()))
+                         for col in self.columns if col in X.columns}
+        self.fitted_ = True
+        return self
+
+    def transform(self, X):
+        X = X.copy()
+        for col, classes in self.classes_.items():
+            if col in X.columns:
+                X[col] = pd.Categorical(X[col].astype(str), categories=classes).codes
+        return X
+
+
+class ColumnScaler(PreprocessingStep):
+    """Standardize or min-max scale columns with the training statistics.
+
+    The fitted scaler is kept as per-column parameters (mean/scale or scale/min, applied
+    with sklearn's own arithmetic), so rows that lack some of the columns (e.g. the target
+    at prediction time) can still be transformed.
+    """
+
+    def __init__(self, columns=(), method='standard'):
+        self.columns = columns
+        self.method = method
+
+    def fit(self, X, y=None):
+        scaler = StandardScaler() if self.method == 'standard' else MinMaxScaler()
+        scaler.fit(X[list(self.columns)])
+        return self._store(scaler)
+
+    def can_partial_fit(self):
+        return True
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, 'scaler_'):
+            self.scaler_ = StandardScaler() if self.method == 'standard' else MinMaxScaler()
+        self.scaler_.partial_fit(X[list(self.columns)])
+        return self._store(self.scaler_)
+
+    def _store(self, scaler):
+        """Keep a fitted sklearn scaler's statistics as per-column parameters"""
+        if self.method == 'standard':
+            self.params_ = dict(zip(self.columns, zip(scaler.mean_, scaler.scale_)))
+        else:
+            self.params_ = dict(zip(self.columns, zip(scaler.scale_, scaler.min_)))
+        self.fitted_ = True
+        return self
+
+    def transform(self, X):
+        columns = [col for col in self.columns if col in X.columns]
+        if not columns:
+            return X
+        X = X.copy()
+        first, second = np.array([self.params_[col] for col in columns]).T
+        values = X[columns].to_numpy(dtype=float)
+        if self.method == 'standard':
+            X[columns] = (values - first) / second
+        else:
+            X[columns] = values * first + second
+        return X
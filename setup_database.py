@@ -1,10 +1,17 @@
 """
 Database Setup Script
 Run this script to verify database connection and initialize the database
-Works with both MySQL (local) and PostgreSQL (Render)
+Works with MySQL (local), PostgreSQL (Render) and SQLite (DB_TYPE=sqlite, embedded)
+
+    python setup_database.py                              # verify and initialize
+    python setup_database.py datasets                     # report uploaded datasets and their size
+    python setup_database.py datasets --reclaim           # drop datasets idle past the session lifetime
+    python setup_database.py datasets --reclaim --max-age-hours 24
 """
 
+import argparse
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,9 +19,15 @@ load_dotenv()
 
 # Detect database type
 DATABASE_URL = os.getenv('DATABASE_URL', '')  # Render PostgreSQL uses this
-USE_POSTGRESQL = bool(DATABASE_URL)
+USE_SQLITE = os.getenv('DB_TYPE', '').lower() == 'sqlite'  # Single node: embedded, no server
+USE_POSTGRESQL = bool(DATABASE_URL) and not USE_SQLITE
 
-if USE_POSTGRESQL:
+if USE_SQLITE:
+    # Embedded: SQLite
+    import sqlite3
+    from sqlite3 import Error
+    print("🪶 Using SQLite (Embedded)")
+elif USE_POSTGRESQL:
     # Production: PostgreSQL (Render)
     import psycopg2
     from psycopg2 import Error
@@ -26,7 +39,12 @@ else:
     print("🐬 Using MySQL (Local)")
 
 # Database Configuration
-if USE_POSTGRESQL:
+if USE_SQLITE:
+    # SQLite - a single database file next to the app (same default as app.py)
+    DB_CONFIG = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ml_webapp.sqlite3'))
+    DB_TYPE = 'sqlite'
+    DATABASE_NAME = DB_CONFIG
+elif USE_POSTGRESQL:
     # Render PostgreSQL - uses DATABASE_URL
     DB_CONFIG = DATABASE_URL
     DB_TYPE = 'postgresql'
@@ -46,7 +64,15 @@ def test_connection():
     """Test database connection"""
     print(f"Testing {DB_TYPE.upper()} connection...")
     try:
-        if DB_TYPE == 'postgresql':
+        if DB_TYPE == 'sqlite':
+            # SQLite connection (creates the file if needed)
+            connection = sqlite3.connect(DB_CONFIG)
+            version = connection.execute("SELECT sqlite_version()").fetchone()[0]
+            print(f"✓ Successfully opened SQLite {version} database")
+            print(f"✓ Database file: {DB_CONFIG}")
+            connection.close()
+            return True
+        elif DB_TYPE == 'postgresql':
             # PostgreSQL connection
             connection = psycopg2.connect(DB_CONFIG)
             
@@ -88,6 +114,9 @@ def test_connection():
     except Error as e:
         print(f"✗ Error connecting to {DB_TYPE.upper()}: {e}")
         print("\nPlease check:")
+        if DB_TYPE == 'sqlite':
+            print("1. The directory of SQLITE_PATH exists and is writable")
+            return False
         print("1. Database server is running")
         print("2. Your .env file is configured correctly")
         print("3. Username and password in .env are correct")
@@ -97,7 +126,23 @@ def test_connection():
 
 def create_database():
     """Create/verify the application database"""
-    if DB_TYPE == 'postgresql':
+    if DB_TYPE == 'sqlite':
+        # SQLite: switch the file to WAL mode (persistent), so readers never block the writer
+        print(f"\nPreparing SQLite database '{DATABASE_NAME}'...")
+        try:
+            connection = sqlite3.connect(DB_CONFIG)
+            journal_mode = connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            print(f"✓ Journal mode: {journal_mode}")
+            
+            table_count = connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+            print(f"✓ Number of tables: {table_count}")
+            
+            connection.close()
+            return True
+        except Error as e:
+            print(f"✗ Error preparing SQLite database: {e}")
+            return False
+    elif DB_TYPE == 'postgresql':
         # PostgreSQL: Database is already created by Render
         print(f"\nVerifying PostgreSQL database connection...")
         try:
@@ -148,6 +193,50 @@ def create_database():
             print(f"✗ Error creating MySQL database: {e}")
             return False
 
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def report_datasets(reclaim=False, max_age_hours=None):
+    """Print every dataset with its owner, size and idle time; with reclaim, drop the expired ones"""
+    # The app owns the dataset registry and lifecycle rules
+    import app as webapp
+    
+    max_age = webapp.dataset_ttl() if max_age_hours is None else max_age_hours * 3600
+    try:
+        datasets = webapp.list_datasets()
+    except webapp.Error as e:
+        print(f"✗ Error reading the dataset registry: {e}")
+        return False
+    
+    now = time.time()
+    print(f"\n{'Dataset':<45} {'Owner':<10} {'Rows':>10} {'Size':>10} {'Idle':>8}")
+    print("-" * 87)
+    for dataset in datasets:
+        idle = now - dataset['last_access']
+        owner = (dataset['owner'] or '-')[:8]
+        rows = f"{dataset['rows']:,}" if dataset['rows'] else '-'
+        size = format_bytes(dataset['size_bytes']) if dataset['size_bytes'] else '-'
+        expired = '  expired' if idle > max_age else ''
+        print(f"{dataset['table_name']:<45} {owner:<10} {rows:>10} {size:>10} {idle / 3600:>7.1f}h{expired}")
+    
+    expired = [dataset for dataset in datasets if now - dataset['last_access'] > max_age]
+    print(f"\n📊 {len(datasets)} datasets, {format_bytes(sum(d['size_bytes'] for d in datasets))} recorded")
+    print(f"   {len(expired)} idle for more than {max_age / 3600:.1f}h, "
+          f"{format_bytes(sum(d['size_bytes'] for d in expired))} reclaimable")
+    dedup = webapp.upload_dedup_totals()
+    print(f"   {dedup['hits']} uploads reused an identical dataset ({dedup['indexed']} files indexed)")
+    
+    if reclaim:
+        dropped = webapp.sweep_expired_datasets(max_age)
+        print(f"✓ Dropped {len(dropped)} datasets, reclaimed {format_bytes(sum(n for _, n in dropped))}")
+    elif expired:
+        print("   Run with --reclaim to drop them")
+    return True
+
 def main():
     print("=" * 70)
     print("ML Web App - Database Setup")
@@ -158,7 +247,9 @@ def main():
     print("📋 Configuration:")
     print(f"   Database Type: {DB_TYPE.upper()}")
     
-    if DB_TYPE == 'postgresql':
+    if DB_TYPE == 'sqlite':
+        print(f"   Database file: {DATABASE_NAME}")
+    elif DB_TYPE == 'postgresql':
         print(f"   Connection: Using DATABASE_URL from environment")
         print(f"   Database: {DATABASE_NAME}")
     else:
@@ -175,7 +266,11 @@ def main():
         print("❌ Setup failed - Could not connect to database")
         print("=" * 70)
         
-        if DB_TYPE == 'postgresql':
+        if DB_TYPE == 'sqlite':
+            print("\nFor SQLite:")
+            print("1. Point SQLITE_PATH at a writable location")
+            print("2. Or unset DB_TYPE to use MySQL/PostgreSQL")
+        elif DB_TYPE == 'postgresql':
             print("\nFor Render PostgreSQL:")
             print("1. Make sure you created a PostgreSQL database in Render")
             print("2. Copy the Internal Database URL")
@@ -202,7 +297,11 @@ def main():
     print()
     print("Next steps:")
     
-    if DB_TYPE == 'postgresql':
+    if DB_TYPE == 'sqlite':
+        print("1. Your SQLite database file is ready!")
+        print("2. Run: DB_TYPE=sqlite python app.py")
+        print("3. Open browser to: http://localhost:5000")
+    elif DB_TYPE == 'postgresql':
         print("1. Your PostgreSQL database on Render is ready!")
         print("2. Deploy your app to Render")
         print("3. Your app will connect automatically using DATABASE_URL")
@@ -213,11 +312,22 @@ def main():
     
     print()
     print("💡 Tip:")
-    if DB_TYPE == 'postgresql':
+    if DB_TYPE == 'sqlite':
+        print("   DB_TYPE=sqlite runs the app without a database server (single node)")
+    elif DB_TYPE == 'postgresql':
         print("   The app automatically detects PostgreSQL when DATABASE_URL is set")
     else:
         print("   The app automatically uses MySQL when running locally")
     print("   Same code works in both environments! 🎉")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Set up the database or manage uploaded datasets')
+    parser.add_argument('command', nargs='?', choices=['setup', 'datasets'], default='setup')
+    parser.add_argument('--reclaim', action='store_true', help='drop expired datasets')
+    parser.add_argument('--max-age-hours', type=float,
+                        help='idle time after which a dataset expires (default: the session lifetime)')
+    args = parser.parse_args()
+    if args.command == 'datasets':
+        report_datasets(args.reclaim, args.max_age_hours)
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+// Submit a request that may run as a background job and resolve with its final JSON result.
+// Routes that accept `async` answer with a job id; the job is then polled until it finishes.
+function runJob(url, options) {
+    return fetch(url, options)
+        .then(response => response.json())
+        .then(data => (data.success && data.job_id) ? pollJob(data.status_url) : data);
+}
+
+function pollJob(statusUrl, intervalMs = 1000) {
+    return new Promise((resolve, reject) => {
+        function check() {
+            fetch(statusUrl)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        resolve(data);
+                    } else if (data.job.state === 'done') {
+                        resetJobProgress();
+                        resolve(data.result);
+                    } else if (data.job.state === 'failed') {
+                        resetJobProgress();
+                        resolve({ success: false, message: data.job.error });
+                    } else {
+                        showJobProgress(data.job);
+                        setTimeout(check, intervalMs);
+                    }
+                })
+                .catch(error => {
+                    resetJobProgress();
+                    reject(error);
+                });
+        }
+        check();
+    });
+}
+
+function showJobProgress(job) {
+    const label = document.querySelector('#loadingSpinner p');
+    if (!label || !job.message) {
+        return;
+    }
+    if (!label.dataset.defaultText) {
+        label.dataset.defaultText = label.textContent;
+    }
+    label.textContent = `${job.message} (${Math.round(job.progress * 100)}%)`;
+}
+
+function resetJobProgress() {
+    const label = document.querySelector('#loadingSpinner p');
+    if (label && label.dataset.defaultText) {
+        label.textContent = label.dataset.defaultText;
+    }
+}
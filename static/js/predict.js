@@ -9,6 +9,11 @@ function makePrediction() {
     
     const values = {};
     for (let [key, value] of formData.entries()) {
+        // Categorical features are sent as-is; the stored pipeline encodes them
+        if (form.elements[key].tagName === 'SELECT') {
+            values[key] = value;
+            continue;
+        }
         values[key] = parseFloat(value);
         
         if (isNaN(values[key])) {
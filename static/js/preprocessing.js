@@ -39,6 +39,7 @@ function handleMissing() {
         
         if (data.success) {
             showMessage(data.message, 'success');
+            loadPipeline();
         } else {
             showMessage(data.message, 'error');
         }
@@ -75,7 +76,7 @@ function visualizeOutliers() {
             const vizDiv = document.getElementById('outlierVisualization');
             vizDiv.innerHTML = `
                 <div class="image-container">
-                    <img src="data:image/png;base64,${data.image}" alt="Outlier Visualization">
+                    <img src="${data.image_url}" alt="Outlier Visualization">
                 </div>
             `;
             showMessage('Outliers visualized successfully', 'success');
@@ -93,6 +94,7 @@ function handleOutliers() {
     const checkboxes = document.querySelectorAll('.outlier-checkbox:checked');
     const selectedColumns = Array.from(checkboxes).map(cb => cb.value);
     const method = document.getElementById('outlierMethod').value;
+    const rule = document.getElementById('outlierRule').value;
     
     if (selectedColumns.length === 0) {
         showMessage('Please select at least one column', 'error');
@@ -106,17 +108,18 @@ function handleOutliers() {
     
     document.getElementById('loadingSpinner').style.display = 'block';
     
-    fetch('/handle_outliers', {
+    runJob('/handle_outliers', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
             columns: selectedColumns,
-            method: method
+            method: method,
+            rule: rule,
+            async: true
         })
     })
-    .then(response => response.json())
     .then(data => {
         document.getElementById('loadingSpinner').style.display = 'none';
         
@@ -125,10 +128,11 @@ function handleOutliers() {
             resultDiv.innerHTML = `
                 <h3>Before & After Comparison</h3>
                 <div class="image-container">
-                    <img src="data:image/png;base64,${data.image}" alt="Outlier Handling Result">
+                    <img src="${data.image_url}" alt="Outlier Handling Result">
                 </div>
             `;
             showMessage(data.message, 'success');
+            loadPipeline();
         } else {
             showMessage(data.message, 'error');
         }
@@ -172,6 +176,7 @@ function encodeData() {
         
         if (data.success) {
             showMessage(data.message, 'success');
+            loadPipeline();
         } else {
             showMessage(data.message, 'error');
         }
@@ -199,22 +204,23 @@ function scaleData() {
     
     document.getElementById('loadingSpinner').style.display = 'block';
     
-    fetch('/scale_data', {
+    runJob('/scale_data', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify({
             columns: selectedColumns,
-            method: method
+            method: method,
+            async: true
         })
     })
-    .then(response => response.json())
     .then(data => {
         document.getElementById('loadingSpinner').style.display = 'none';
         
         if (data.success) {
             showMessage(data.message, 'success');
+            loadPipeline();
         } else {
             showMessage(data.message, 'error');
         }
@@ -225,6 +231,37 @@ function scaleData() {
     });
 }
 
+function loadPipeline() {
+    fetch('/pipeline')
+    .then(response => response.json())
+    .then(data => {
+        const list = document.getElementById('pipelineSteps');
+        list.innerHTML = '';
+        if (data.steps.length === 0) {
+            list.innerHTML = '<li>No steps applied yet</li>';
+        }
+        data.steps.forEach(step => {
+            const item = document.createElement('li');
+            item.textContent = step.message;
+            list.appendChild(item);
+        });
+    });
+}
+
+function pipelineAction(action) {
+    fetch('/pipeline/' + action, { method: 'POST' })
+    .then(response => response.json())
+    .then(data => {
+        showMessage(data.message, data.success ? 'success' : 'error');
+        loadPipeline();
+    })
+    .catch(error => {
+        showMessage('Error: ' + error.message, 'error');
+    });
+}
+
+document.addEventListener('DOMContentLoaded', loadPipeline);
+
 function showMessage(message, type) {
     const messageDiv = document.getElementById('message');
     messageDiv.textContent = message;
@@ -17,6 +17,11 @@ function updateAlgorithmOptions() {
     }
 }
 
+function toggleIncrementalOptions() {
+    const incremental = document.getElementById('incrementalMode').checked;
+    document.getElementById('incrementalOptions').style.display = incremental ? 'block' : 'none';
+}
+
 function trainModel() {
     const algorithm = document.getElementById('algorithm').value;
     const target = document.getElementById('targetVariable').value;
@@ -46,22 +51,34 @@ function trainModel() {
         return;
     }
     
+    const payload = {
+        algorithm: algorithm,
+        target: target,
+        test_size: testSizeNum,
+        random_state: randomStateNum,
+        async: true
+    };
+    
+    if (document.getElementById('incrementalMode').checked) {
+        const epochs = parseInt(document.getElementById('epochs').value);
+        if (isNaN(epochs) || epochs < 1) {
+            showMessage('Epochs must be a positive integer', 'error');
+            return;
+        }
+        payload.mode = 'incremental';
+        payload.epochs = epochs;
+    }
+    
     // Show loading
     document.getElementById('loadingSpinner').style.display = 'block';
     
-    fetch('/training', {
+    runJob('/training', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({
-            algorithm: algorithm,
-            target: target,
-            test_size: testSizeNum,
-            random_state: randomStateNum
-        })
+        body: JSON.stringify(payload)
     })
-    .then(response => response.json())
     .then(data => {
         document.getElementById('loadingSpinner').style.display = 'none';
         
@@ -79,6 +96,78 @@ function trainModel() {
     });
 }
 
+function compareModels() {
+    const target = document.getElementById('targetVariable').value;
+    const folds = parseInt(document.getElementById('cvFolds').value);
+    const randomState = parseInt(document.getElementById('randomState').value);
+    
+    if (!target) {
+        showMessage('Please select a target variable', 'error');
+        return;
+    }
+    
+    if (isNaN(folds) || folds < 2) {
+        showMessage('Cross-validation needs at least 2 folds', 'error');
+        return;
+    }
+    
+    document.getElementById('loadingSpinner').style.display = 'block';
+    
+    runJob('/training', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            mode: 'compare',
+            target: target,
+            folds: folds,
+            random_state: isNaN(randomState) ? 42 : randomState,
+            async: true
+        })
+    })
+    .then(data => {
+        document.getElementById('loadingSpinner').style.display = 'none';
+        
+        if (data.success) {
+            displayLeaderboard(data);
+            document.getElementById('leaderboardSection').style.display = 'block';
+            showMessage('Model comparison complete!', 'success');
+        } else {
+            showMessage(data.message, 'error');
+        }
+    })
+    .catch(error => {
+        document.getElementById('loadingSpinner').style.display = 'none';
+        showMessage('Error: ' + error.message, 'error');
+    });
+}
+
+function displayLeaderboard(data) {
+    const metricName = data.metric === 'r2' ? 'R² Score' : 'Accuracy';
+    document.getElementById('leaderboardMetric').textContent = 'Mean ' + metricName;
+    
+    let summary = `${data.folds}-fold cross-validation of a ${data.problem} target on ${data.n_jobs} worker(s) in ${data.elapsed_seconds.toFixed(2)}s.`;
+    data.skipped.forEach(entry => {
+        summary += ` Skipped ${entry.algorithm}: ${entry.reason}.`;
+    });
+    document.getElementById('leaderboardSummary').textContent = summary;
+    
+    const body = document.getElementById('leaderboardBody');
+    body.innerHTML = '';
+    data.leaderboard.forEach(entry => {
+        const params = Object.entries(entry.params).map(([key, value]) => `${key}=${value}`).join(', ') || 'default';
+        const row = document.createElement('tr');
+        [entry.rank, entry.algorithm, params, entry.score_mean.toFixed(4),
+         entry.score_std.toFixed(4), entry.fit_seconds_mean.toFixed(4)].forEach(value => {
+            const cell = document.createElement('td');
+            cell.textContent = value;
+            row.appendChild(cell);
+        });
+        body.appendChild(row);
+    });
+}
+
 function displayMetrics(metrics, algorithm) {
     const metricsDiv = document.getElementById('metricsDisplay');
     
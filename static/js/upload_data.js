@@ -73,15 +73,15 @@ function uploadFile() {
     
     const formData = new FormData();
     formData.append('file', selectedFile);
+    formData.append('async', 'true');
     
     // Show loading spinner
     document.getElementById('loadingSpinner').style.display = 'block';
     
-    fetch('/upload_data', {
+    runJob('/upload_data', {
         method: 'POST',
         body: formData
     })
-    .then(response => response.json())
     .then(data => {
         document.getElementById('loadingSpinner').style.display = 'none';
         
@@ -0,0 +1,89 @@
+"""Aggregate pushdown must give the same answers as the pandas path it replaces.
+
+Runs against an embedded SQLite database in a temporary directory.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'pushdown.sqlite3')
+os.environ['DATASET_STORAGE'] = 'sql'
+
+import app
+
+
+def save(df, table_name):
+    assert app.save_dataframe_to_db(df, table_name)
+    app.dataframe_cache.invalidate(table_name)
+
+
+def run_pushdown(pushdown, table_name):
+    connection = app.get_db_connection()
+    try:
+        _, physical_name = app.resolve_table(connection, table_name)
+        schema = app.get_table_schema(connection, physical_name)
+        return pushdown(connection, physical_name, schema)
+    finally:
+        connection.close()
+
+
+def test_describe_matches_pandas_for_large_offsets():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'epoch_ms': 1_600_000_000_000 + rng.integers(0, 1000, 500),
+        'price': 1e8 + rng.normal(0, 1, 500),
+        'small': rng.normal(0, 1, 500),
+    })
+    df.loc[::7, 'small'] = np.nan
+    save(df, 'user_data_describe')
+    result = run_pushdown(app.pushdown_describe, 'user_data_describe')
+    expected = df.describe()
+    pd.testing.assert_frame_equal(result[expected.columns], expected, rtol=1e-9)
+
+
+def test_value_counts_do_not_depend_on_the_cache():
+    df = pd.DataFrame({
+        'flag': [True, False, True, True],
+        'maybe': [True, None, False, True],
+        'when': pd.to_datetime(['2020-01-01 10:00', '2020-01-02 00:00', '2020-01-01 10:00', '2020-01-03 00:00']),
+        'count': pd.array([1, None, 3, 3], dtype='Int64'),
+        'label': ['a', 'b', 'a', 'a'],
+    })
+    save(df, 'user_data_counts')
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['table_name'] = 'user_data_counts'
+    request = {'columns': list(df.columns)}
+    
+    cold = client.post('/get_value_counts', json=request).get_json()
+    app.load_processed_dataframe('user_data_counts', [])
+    warm = client.post('/get_value_counts', json=request).get_json()
+    
+    assert cold['success'] and warm['success']
+    assert cold['data'] == warm['data']
+    assert cold['data']['flag'] == {'false': 1, 'true': 3}
+    assert cold['data']['when'] == {'2020-01-01 10:00:00': 2, '2020-01-02 00:00:00': 1, '2020-01-03 00:00:00': 1}
+
+
+def test_summary_dtypes_do_not_depend_on_the_cache():
+    df = pd.DataFrame({
+        'flag': [True, False, True, True],
+        'small': [1, 2, 3, 4],
+        'big': [1, 2, 3, 2**40],
+        'gaps': pd.array([1, None, 3, 3], dtype='Int64'),
+        'price': [1.5, 2.5, np.nan, 4.0],
+        'when': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-04']),
+        'label': ['a', 'b', 'a', 'a'],
+        'name': ['w', 'x', 'y', 'z'],
+    })
+    save(df, 'user_data_summary')
+    
+    cold = app.run_aggregate('user_data_summary', app.pushdown_summary, app.summarize_dataframe)
+    app.load_processed_dataframe('user_data_summary', [])
+    warm = app.run_aggregate('user_data_summary', app.pushdown_summary, app.summarize_dataframe)
+    
+    assert 'computed in the database' in cold['info']
+    assert cold['dtypes'] == {col: str(dtype) for col, dtype in warm['dtypes'].items()}